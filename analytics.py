@@ -0,0 +1,478 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from frame_memo import derived, extends
+
+
+def step_duration_histograms(df, step_column='concept:name', duration_column='Duration (Seconds)', nbins=20,
+                             scale=60):
+    """
+    Bins the durations of every step in one vectorized pass.
+
+    Each step gets nbins equal-width bins spanning its own duration range, like a separate
+    histogram per step, but all counts come from a single bincount over the frame instead
+    of filtering it once per step.
+
+    Parameters
+    ----------
+        df : DataFrame
+            Event rows with a step and a duration column.
+        step_column : str, optional
+            The column naming the step of each row.
+        duration_column : str, optional
+            The duration column, in seconds.
+        nbins : int, optional
+            Number of bins per step.
+        scale : float, optional
+            Divisor applied to durations; the default reports minutes.
+
+    Returns
+    -------
+        tuple
+            (bins, stats). bins has one row per step and bin with 'step', 'bin_left',
+            'bin_right', 'bin_mid' and 'count'. stats has one row per step, in order of first
+            appearance, with 'count', 'mean', 'p50' and 'p95'.
+    """
+    if step_column not in df.columns or duration_column not in df.columns:
+        data = pd.DataFrame(columns=[step_column, duration_column])
+    else:
+        data = df[[step_column, duration_column]].dropna()
+    codes, steps = pd.factorize(data[step_column], sort=False)
+    values = data[duration_column].to_numpy(dtype=np.float64) / scale
+    n_steps = len(steps)
+    if n_steps == 0:
+        empty_bins = pd.DataFrame(columns=['step', 'bin_left', 'bin_right', 'bin_mid', 'count'])
+        empty_stats = pd.DataFrame(columns=['count', 'mean', 'p50', 'p95'])
+        return empty_bins, empty_stats
+
+    lows = np.full(n_steps, np.inf)
+    highs = np.full(n_steps, -np.inf)
+    np.minimum.at(lows, codes, values)
+    np.maximum.at(highs, codes, values)
+    widths = (highs - lows) / nbins
+    widths[widths <= 0] = 1.0
+
+    bin_index = np.floor((values - lows[codes]) / widths[codes]).astype(np.int64)
+    np.clip(bin_index, 0, nbins - 1, out=bin_index)
+    counts = np.bincount(codes * nbins + bin_index, minlength=n_steps * nbins)
+
+    offsets = np.tile(np.arange(nbins), n_steps)
+    step_of_bin = np.repeat(np.arange(n_steps), nbins)
+    bin_left = lows[step_of_bin] + offsets * widths[step_of_bin]
+    bins = pd.DataFrame({
+        'step': np.asarray(steps)[step_of_bin],
+        'bin_left': bin_left,
+        'bin_right': bin_left + widths[step_of_bin],
+        'bin_mid': bin_left + widths[step_of_bin] / 2,
+        'count': counts,
+    })
+
+    grouped = pd.Series(values).groupby(codes, sort=True)
+    stats = pd.DataFrame({
+        'count': grouped.count().to_numpy(),
+        'mean': grouped.mean().to_numpy(),
+        'p50': grouped.quantile(0.5).to_numpy(),
+        'p95': grouped.quantile(0.95).to_numpy(),
+    }, index=pd.Index(steps, name=step_column))
+    return bins, stats
+
+
+def step_histogram_figure(bins, stats, color='#256b6d', unit='Minutes'):
+    """
+    Draws the per-step histograms of step_duration_histograms as one faceted figure.
+
+    Each facet has its own x axis and is titled with the step's mean, median and 95th
+    percentile.
+    """
+    titles = {
+        step: f"{step} Duration Distribution (mean {row['mean']:.2f}, p50 {row['p50']:.2f}, p95 {row['p95']:.2f})"
+        for step, row in stats.iterrows()
+    }
+    fig = px.bar(
+        bins.assign(step=bins['step'].map(titles)),
+        x='bin_mid',
+        y='count',
+        facet_col='step',
+        facet_col_wrap=1,
+        facet_row_spacing=min(0.08, 0.5 / max(len(stats), 1)),
+        category_orders={'step': [titles[step] for step in stats.index]},
+        color_discrete_sequence=[color],
+        labels={'bin_mid': f'Duration ({unit})', 'count': 'Count'},
+        hover_data={'bin_left': ':.2f', 'bin_right': ':.2f'},
+    )
+    fig.update_layout(bargap=0, height=max(300, 260 * len(stats)), showlegend=False)
+    fig.update_xaxes(matches=None, showticklabels=True)
+    fig.update_yaxes(matches=None, title_text='Count')
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split('=', 1)[-1]))
+    return fig
+
+
+def sample_points(values, max_points=500, seed=0):
+    """
+    Returns at most max_points values drawn uniformly without replacement, in their
+    original order.
+
+    This is the sample a reservoir of size max_points would hold after a pass over values;
+    as the length is known up front, the positions are drawn directly. A fixed seed keeps
+    the sample stable across reruns.
+    """
+    values = np.asarray(values)
+    if len(values) <= max_points:
+        return values
+    rng = np.random.default_rng(seed)
+    return values[np.sort(rng.choice(len(values), size=max_points, replace=False))]
+
+
+def duration_histogram(durations, nbins=20, scale=60, max_points=500, seed=0):
+    """
+    Bins durations with NumPy and samples a capped subset of them for a rug.
+
+    The figure built from the result holds nbins bars and at most max_points rug marks,
+    so its size does not grow with the number of cycles.
+
+    Parameters
+    ----------
+        durations : Series or array
+            Durations in seconds; NaNs are dropped.
+        nbins : int, optional
+            Number of equal-width bins.
+        scale : float, optional
+            Divisor applied to durations; the default reports minutes.
+        max_points : int, optional
+            Maximum number of sampled values.
+        seed : int, optional
+            Seed of the sample.
+
+    Returns
+    -------
+        tuple
+            (bins, sample). bins has one row per bin with 'bin_left', 'bin_right',
+            'bin_mid' and 'count'; sample is an array of scaled durations.
+    """
+    values = np.asarray(durations, dtype=np.float64) / scale
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        counts, edges = np.zeros(0, dtype=np.int64), np.zeros(1)
+    else:
+        counts, edges = np.histogram(values, bins=nbins)
+    bins = pd.DataFrame({
+        'bin_left': edges[:-1],
+        'bin_right': edges[1:],
+        'bin_mid': (edges[:-1] + edges[1:]) / 2,
+        'count': counts,
+    })
+    return bins, sample_points(values, max_points=max_points, seed=seed)
+
+
+def histogram_figure(bins, sample=None, color='#256b6d', line_color='#0f3d3e', title=None, unit='Minutes'):
+    """
+    Draws pre-computed bins as a histogram, with the sampled values as a rug above it.
+    """
+    rows = 2 if sample is not None and len(sample) else 1
+    fig = make_subplots(rows=rows, cols=1, shared_xaxes=True, vertical_spacing=0.02,
+                        row_heights=[0.15, 0.85] if rows == 2 else None)
+    if rows == 2:
+        fig.add_trace(go.Scatter(
+            x=sample, y=np.zeros(len(sample)), mode='markers', name='Sample',
+            marker=dict(symbol='line-ns-open', size=14, color=color),
+            hovertemplate='%{x:.2f}<extra></extra>',
+        ), row=1, col=1)
+        fig.update_yaxes(visible=False, row=1, col=1)
+    fig.add_trace(go.Bar(
+        x=bins['bin_mid'], y=bins['count'], width=bins['bin_right'] - bins['bin_left'], name='Count',
+        marker=dict(color=color, line=dict(width=1, color=line_color)),
+        customdata=np.column_stack([bins['bin_left'], bins['bin_right']]) if len(bins) else None,
+        hovertemplate='%{customdata[0]:.2f} - %{customdata[1]:.2f}: %{y}<extra></extra>',
+    ), row=rows, col=1)
+    fig.update_layout(title=title, bargap=0, showlegend=False)
+    fig.update_xaxes(title_text=f'Duration ({unit})', row=rows, col=1)
+    fig.update_yaxes(title_text='Count', row=rows, col=1)
+    return fig
+
+
+def _durations(df, duration_column):
+    """Returns the durations of df as floats, all NaN if df has no duration column."""
+    if duration_column not in df.columns:
+        return np.full(len(df), np.nan)
+    return df[duration_column].to_numpy(dtype=np.float64)
+
+
+def _occupied(keys, size):
+    """
+    Returns the distinct values among keys, integers in [0, size), and their counts.
+
+    Counted with one bincount when size is small next to the number of keys, so building
+    a cube stays linear in its rows; sorted with np.unique otherwise.
+    """
+    if size <= 4 * len(keys) + 65536:
+        counts = np.bincount(keys, minlength=size)
+        distinct = np.flatnonzero(counts)
+        return distinct, counts[distinct]
+    return np.unique(keys, return_counts=True)
+
+
+class KpiCube:
+    """
+    Pre-aggregated duration KPIs over a few low-cardinality filter dimensions of a frame.
+
+    The frame is grouped once into cells, one per combination of dimension values that
+    occurs, each holding the duration sum and count, the number of cycles and a log-bucket
+    quantile sketch (relative error alpha, in the style of DDSketch). Cells are dense
+    arrays indexed by cell number, and every dimension keeps the code of its value per
+    cell, so a query maps the selected values to codes once and rolls the KPIs up with a
+    few array operations instead of scanning the rows.
+
+    The cube only pays off while it is much smaller than the frame, that is while the
+    product of the dimension cardinalities is small: leave high-cardinality columns such
+    as week numbers out and answer selections on them with scan_kpis (see covers).
+
+    Attributes
+    ----------
+    dimensions : list
+        The dimension columns.
+    n_cells : int
+        Number of cells.
+    alpha : float
+        Relative accuracy of the quantile sketches.
+    """
+
+    def __init__(self, df, dimensions, duration_column='Duration (Seconds)', count_column='Case ID', alpha=0.01):
+        """
+        Parameters
+        ----------
+            df : DataFrame
+                The rows to aggregate.
+            dimensions : list
+                Columns to aggregate over; those missing from df are skipped.
+            duration_column : str, optional
+                The measure summarized by sum, mean and quantiles; if df has no such
+                column, cycles are still counted and duration statistics are NaN.
+            count_column : str, optional
+                Non-null values of this column are counted as cycles.
+            alpha : float, optional
+                Relative accuracy of the quantile sketches.
+        """
+        self.dimensions = [d for d in dimensions if d in df.columns]
+        self.alpha = alpha
+        self._columns = (duration_column, count_column)
+        self._gamma = (1 + alpha) / (1 - alpha)
+        durations = _durations(df, duration_column)
+        cell_ids = self._cell_ids(df)
+        n_cells = self.n_cells
+        valid = ~np.isnan(durations)
+        self._duration_sum = np.bincount(cell_ids[valid], weights=durations[valid], minlength=n_cells)
+        self._duration_count = np.bincount(cell_ids[valid], minlength=n_cells)
+        has_cycle = df[count_column].notna().to_numpy() if count_column in df.columns else np.ones(len(df), bool)
+        self._cycles = np.bincount(cell_ids[has_cycle], minlength=n_cells)
+
+        # bucket 0 holds zero durations, bucket k > 0 the log bucket k - 1 + self._lowest_bucket
+        positive = valid & (durations > 0)
+        logs = np.ceil(np.log(durations[positive]) / np.log(self._gamma)).astype(np.int64)
+        self._lowest_bucket = int(logs.min()) if len(logs) else 0
+        bucket_ids = np.zeros(len(durations), dtype=np.int64)
+        bucket_ids[positive] = logs - self._lowest_bucket + 1
+        self._n_buckets = int(bucket_ids.max(initial=0)) + 1
+        # sparse sketch, one entry per occupied (cell, bucket) pair, sorted by cell
+        occupied, self._sketch_n = _occupied(cell_ids[valid] * self._n_buckets + bucket_ids[valid],
+                                             n_cells * self._n_buckets)
+        self._sketch_cell, self._sketch_bucket = np.divmod(occupied, self._n_buckets)
+        self._sketch_offsets = np.searchsorted(self._sketch_cell, np.arange(n_cells + 1))
+        self._all_buckets = np.bincount(self._sketch_bucket, weights=self._sketch_n, minlength=self._n_buckets)
+
+    def _cell_ids(self, df):
+        """
+        Returns the cell number of every row and sets the distinct values of every
+        dimension and their codes per cell.
+        """
+        codes = []
+        self._values = []
+        for dimension in self.dimensions:
+            c, u = pd.factorize(df[dimension], use_na_sentinel=False)
+            codes.append(c)
+            self._values.append(pd.Index(u))
+        sizes = [len(u) for u in self._values]
+        if codes and len(df):
+            flat = np.ravel_multi_index(codes, sizes)
+        else:
+            flat = np.zeros(len(df), dtype=np.int64)
+        cells, _ = _occupied(flat, int(np.prod(sizes)))
+        self.n_cells = len(cells)
+        self._cell_codes = list(np.unravel_index(cells, sizes)) if codes else []
+        return np.searchsorted(cells, flat)
+
+    def extend(self, df):
+        """
+        Returns the cube of this cube's rows plus the rows of df, without rescanning them.
+
+        df is aggregated alone and merged in cell by cell (see merge), so the cost grows
+        with df and the number of cells, not with the rows already aggregated.
+        """
+        duration_column, count_column = self._columns
+        return self.merge(KpiCube(df, self.dimensions, duration_column=duration_column,
+                                  count_column=count_column, alpha=self.alpha))
+
+    def merge(self, other):
+        """
+        Returns the cube of the rows of both cubes.
+
+        Cells with the same dimension values are added up, sketch buckets included, so the
+        result answers every query like a cube built over both frames at once.
+
+        Raises
+        ------
+            ValueError
+                If the cubes differ in dimensions or accuracy.
+        """
+        if other.dimensions != self.dimensions or other.alpha != self.alpha:
+            raise ValueError("Only cubes with the same dimensions and alpha can be merged.")
+        merged = object.__new__(KpiCube)
+        merged.dimensions = list(self.dimensions)
+        merged.alpha = self.alpha
+        merged._columns = self._columns
+        merged._gamma = self._gamma
+
+        # dimension values keep their codes from self; values new in other are appended
+        merged._values, codes = [], []
+        for values, other_values, cell_codes, other_cell_codes in zip(self._values, other._values, self._cell_codes,
+                                                                        other._cell_codes):
+            union = values.append(other_values[~other_values.isin(values)])
+            merged._values.append(union)
+            codes.append(np.concatenate([cell_codes, union.get_indexer(other_values)[other_cell_codes]]))
+        sizes = [len(u) for u in merged._values]
+        flat = np.ravel_multi_index(codes, sizes) if codes else np.zeros(self.n_cells + other.n_cells, dtype=np.int64)
+        cells, cell_ids = np.unique(flat, return_inverse=True)
+        merged.n_cells = len(cells)
+        merged._cell_codes = list(np.unravel_index(cells, sizes)) if codes else []
+        own, theirs = cell_ids[:self.n_cells], cell_ids[self.n_cells:]
+
+        def add(mine, others, dtype):
+            return np.bincount(cell_ids, weights=np.concatenate([mine, others]), minlength=merged.n_cells).astype(dtype)
+
+        merged._duration_sum = add(self._duration_sum, other._duration_sum, np.float64)
+        merged._duration_count = add(self._duration_count, other._duration_count, np.int64)
+        merged._cycles = add(self._cycles, other._cycles, np.int64)
+
+        # re-base the log buckets of both sketches on the lower of their lowest buckets
+        with_logs = [cube._lowest_bucket for cube in (self, other) if cube._n_buckets > 1]
+        merged._lowest_bucket = min(with_logs) if with_logs else 0
+        entry_cells, entry_buckets = [], []
+        for cube, ids in ((self, own), (other, theirs)):
+            entry_cells.append(ids[cube._sketch_cell])
+            shift = cube._lowest_bucket - merged._lowest_bucket
+            entry_buckets.append(np.where(cube._sketch_bucket > 0, cube._sketch_bucket + shift, 0))
+        entry_buckets = np.concatenate(entry_buckets)
+        merged._n_buckets = int(entry_buckets.max(initial=0)) + 1
+        keys, entry_ids = np.unique(np.concatenate(entry_cells) * merged._n_buckets + entry_buckets,
+                                    return_inverse=True)
+        merged._sketch_n = np.bincount(entry_ids, weights=np.concatenate([self._sketch_n, other._sketch_n]),
+                                       minlength=len(keys)).astype(np.int64)
+        merged._sketch_cell, merged._sketch_bucket = np.divmod(keys, merged._n_buckets)
+        merged._sketch_offsets = np.searchsorted(merged._sketch_cell, np.arange(merged.n_cells + 1))
+        merged._all_buckets = np.bincount(merged._sketch_bucket, weights=merged._sketch_n,
+                                          minlength=merged._n_buckets)
+        return merged
+
+    def covers(self, selections):
+        """Returns whether every non-empty selection is on a dimension of the cube."""
+        return all(dimension in self.dimensions for dimension, values in selections.items() if values)
+
+    def _cell_mask(self, selections):
+        mask = np.ones(self.n_cells, dtype=bool)
+        for dimension, values in selections.items():
+            if values:
+                i = self.dimensions.index(dimension)
+                mask &= self._values[i].isin(values)[self._cell_codes[i]]
+        return mask
+
+    def query(self, selections, quantiles=(0.5, 0.95)):
+        """
+        Rolls up the KPIs of a selection.
+
+        Parameters
+        ----------
+            selections : dict
+                Dimension names mapped to their selected values; empty lists select all.
+            quantiles : tuple, optional
+                Duration quantiles to estimate from the sketches.
+
+        Returns
+        -------
+            dict
+                'cycles', 'duration_sum', 'duration_count', 'mean' and one 'pNN' entry per
+                quantile. Statistics of an empty selection are NaN.
+
+        Raises
+        ------
+            ValueError
+                If a value is selected on a column that is not a dimension of the cube.
+        """
+        if not self.covers(selections):
+            outside = [d for d, values in selections.items() if values and d not in self.dimensions]
+            raise ValueError(f"Selections on {outside} cannot be answered by a cube over {self.dimensions}.")
+        mask = self._cell_mask(selections)
+        cells = np.flatnonzero(mask)
+        duration_count = int(self._duration_count[cells].sum())
+        result = {
+            'cycles': int(self._cycles[cells].sum()),
+            'duration_sum': float(self._duration_sum[cells].sum()),
+            'duration_count': duration_count,
+        }
+        result['mean'] = result['duration_sum'] / duration_count if duration_count else np.nan
+        if len(cells) == self.n_cells:
+            merged = self._all_buckets
+        else:
+            # gather the sketch entries of the selected cells only
+            starts = self._sketch_offsets[cells]
+            lengths = self._sketch_offsets[cells + 1] - starts
+            entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            merged = np.bincount(self._sketch_bucket[entries], weights=self._sketch_n[entries],
+                                 minlength=self._n_buckets)
+        cumulative = np.cumsum(merged)
+        for q in quantiles:
+            key = f"p{round(q * 100):d}"
+            if not duration_count:
+                result[key] = np.nan
+                continue
+            bucket_id = int(np.searchsorted(cumulative, q * (duration_count - 1), side='right'))
+            bucket = bucket_id - 1 + self._lowest_bucket
+            result[key] = 0.0 if bucket_id == 0 else 2 * self._gamma ** bucket / (self._gamma + 1)
+        return result
+
+
+def scan_kpis(df, quantiles=(0.5, 0.95), duration_column='Duration (Seconds)', count_column='Case ID'):
+    """
+    Computes the KPIs of KpiCube.query from the rows of df, for selections a cube does not
+    cover.
+
+    Quantiles are the exact lower-rank values, the same definition the cube's sketches
+    approximate, so a KPI does not change meaning between the two paths.
+    """
+    durations = pd.Series(_durations(df, duration_column)).dropna()
+    cycles = int(df[count_column].notna().sum()) if count_column in df.columns else len(df)
+    result = {'cycles': cycles, 'duration_sum': float(durations.sum()), 'duration_count': len(durations)}
+    result['mean'] = result['duration_sum'] / len(durations) if len(durations) else np.nan
+    for q in quantiles:
+        result[f"p{round(q * 100):d}"] = float(durations.quantile(q, interpolation='lower')) if len(durations) \
+            else np.nan
+    return result
+
+
+def kpi_cube(df, dimensions, **kwargs):
+    """
+    Returns the KpiCube of df, building it once per dataframe.
+
+    Shared frames from the table store are reused across reruns, so the cube is only
+    built when a table is loaded; an incremental refresh extends the previous version's
+    cube with the appended rows.
+    """
+    return derived(df, ('kpi_cube', tuple(dimensions), tuple(sorted(kwargs.items()))),
+                   lambda d: KpiCube(d, dimensions, **kwargs))
+
+
+@extends('kpi_cube')
+def _extend_cube(cube, rows):
+    """Carries a table version's cube over to the next one when the table store appends rows."""
+    return cube.extend(rows)
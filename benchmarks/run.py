@@ -0,0 +1,207 @@
+"""
+Benchmarks the dashboard's data paths on synthetic event logs.
+
+Runs headless: Streamlit's session state is replaced by a plain dict, so no script
+runner or browser is needed. Every benchmark reports its best and median wall time over
+several repeats and the peak memory allocated by one extra traced run.
+
+Usage, from the repository root:
+
+    python benchmarks/run.py --rows 10000 100000 1000000 --save baseline.json
+    python benchmarks/run.py --rows 10000 100000 1000000 --baseline baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import KpiCube, duration_histogram, histogram_figure, step_duration_histograms
+from custom_dynamic_filters import DynamicFilters, FilterEngine, FilterResultCache
+from process_maps import create_variant_diagram
+from synthetic import EventLogSpec, all_variants, machine_data
+
+
+VARIANTS_FILTERS = ['machine', 'Variant Rank', 'week_number']
+STEPS_FILTERS = ['Variant Rank', 'concept:name']
+VARIANTS_KPI_DIMENSIONS = ['machine', 'Variant Rank']
+STEPS_KPI_DIMENSIONS = ['Variant Rank', 'concept:name']
+
+
+@contextmanager
+def stub_session_state():
+    """Replaces st.session_state by a dict for the duration of the block."""
+    with mock.patch.object(st, 'session_state', {}):
+        yield
+
+
+def selection_of(df, filters):
+    """Returns a selection of a few frequent values per filter, like a user's first clicks."""
+    return {f: df[f].value_counts().index[:3].tolist() for f in filters}
+
+
+def dynamic_filters(df, filters, selection, cache=None):
+    f = DynamicFilters(df, filters, identifier='bench', cache=cache)
+    st.session_state[f.filters_name] = {k: list(v) for k, v in selection.items()}
+    return f
+
+
+def benchmarks(table, df):
+    """
+    Returns the benchmarks of one table as (name, setup) pairs.
+
+    setup() prepares the state of a benchmark outside the timed region and returns the
+    callable that is timed.
+    """
+    filters = VARIANTS_FILTERS if table == 'all_variants' else STEPS_FILTERS
+    kpi_dimensions = VARIANTS_KPI_DIMENSIONS if table == 'all_variants' else STEPS_KPI_DIMENSIONS
+    selection = selection_of(df, filters)
+    # the part of the selection the pages answer from the cube
+    cube_selection = {k: v for k, v in selection.items() if k in kpi_dimensions}
+
+    def index_build():
+        return lambda: FilterEngine(df, filters)
+
+    def filter_df():
+        f = dynamic_filters(df, filters, selection)
+        f.engine
+        return f.filter_df
+
+    def filter_df_cached():
+        f = dynamic_filters(df, filters, selection, cache=FilterResultCache())
+        f.filter_df()
+        return f.filter_df
+
+    def filter_options():
+        # display_filters computes every filter's options until the selection converges
+        f = dynamic_filters(df, filters, selection)
+        f.engine
+        return lambda: f.converge({k: list(v) for k, v in selection.items()})
+
+    def kpis_scan():
+        f = dynamic_filters(df, filters, selection)
+        f.engine
+
+        def run():
+            filtered = f.filter_df()
+            durations = filtered['Duration (Seconds)']
+            return filtered['Case ID'].count(), durations.mean(), durations.quantile([0.5, 0.95])
+        return run
+
+    def kpi_cube_build():
+        return lambda: KpiCube(df, kpi_dimensions)
+
+    def kpi_cube_query():
+        cube = KpiCube(df, kpi_dimensions)
+        return lambda: cube.query(cube_selection)
+
+    def step_histograms():
+        return lambda: step_duration_histograms(df, nbins=20)
+
+    def cycle_histogram():
+        # includes serializing the figure, which is what the browser receives
+        return lambda: histogram_figure(*duration_histogram(df['Duration (Seconds)'])).to_json()
+
+    def variant_diagrams():
+        variants = df['Variant'].value_counts().index[:10].astype(str).tolist()
+        return lambda: [create_variant_diagram(v).source for v in variants]
+
+    cases = [('filter_index_build', index_build), ('filter_df', filter_df), ('filter_df_cached', filter_df_cached),
+             ('filter_options', filter_options), ('kpis_scan', kpis_scan), ('kpi_cube_build', kpi_cube_build),
+             ('kpi_cube_query', kpi_cube_query), ('cycle_histogram', cycle_histogram),
+             ('variant_diagrams', variant_diagrams)]
+    if 'concept:name' in df.columns:
+        cases.append(('step_histograms', step_histograms))
+    return cases
+
+
+def measure(setup, repeat):
+    """Returns the best and median seconds of repeat timed calls and the traced peak bytes."""
+    timed = setup()
+    timed()
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        timed()
+        seconds.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        timed()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(seconds), float(np.median(seconds)), peak
+
+
+def run(rows, spec, repeat, tables, only=None):
+    results = []
+    for n in rows:
+        for table in tables:
+            df = all_variants(n, spec) if table == 'all_variants' else machine_data(n, spec, machine='M001')
+            frame_bytes = int(df.memory_usage(index=True, deep=True).sum())
+            for name, setup in benchmarks(table, df):
+                if only and name not in only:
+                    continue
+                with stub_session_state():
+                    best, median, peak = measure(setup, repeat)
+                results.append({'benchmark': name, 'table': table, 'rows': n, 'best_s': best, 'median_s': median,
+                                'peak_mb': peak / 1024 ** 2, 'frame_mb': frame_bytes / 1024 ** 2})
+                print(f"{table:>12} {n:>10,} {name:<20} {best * 1000:10.2f} ms {peak / 1024 ** 2:10.1f} MB",
+                      file=sys.stderr)
+            del df
+    return pd.DataFrame(results)
+
+
+def compare(results, baseline):
+    """Adds the ratio of every timing and peak to the matching baseline result."""
+    keys = ['benchmark', 'table', 'rows']
+    merged = results.merge(baseline[keys + ['best_s', 'peak_mb']], on=keys, how='left', suffixes=('', '_baseline'))
+    merged['time_ratio'] = merged['best_s'] / merged['best_s_baseline']
+    merged['peak_ratio'] = merged['peak_mb'] / merged['peak_mb_baseline']
+    return merged.drop(columns=['best_s_baseline', 'peak_mb_baseline'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='table sizes to generate (default: 10k, 100k and 1M rows)')
+    parser.add_argument('--tables', nargs='+', choices=['all_variants', 'machine_data'],
+                        default=['all_variants', 'machine_data'])
+    parser.add_argument('--only', nargs='+', help='run only these benchmarks')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--machines', type=int, default=8)
+    parser.add_argument('--variants', type=int, default=200)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--steps', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against results saved with --save')
+    args = parser.parse_args(argv)
+
+    spec = EventLogSpec(machines=args.machines, variants=args.variants, weeks=args.weeks, steps=args.steps,
+                        seed=args.seed)
+    results = run(args.rows, spec, args.repeat, args.tables, only=args.only)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results.to_dict(orient='records'), f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results = compare(results, pd.DataFrame(json.load(f)))
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.float_format', '{:.4g}'.format):
+        print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+from compaction import compact_frame
+
+
+STEPS = ['Load Reel', 'Thread Film', 'Rewind', 'Splice', 'Inspect', 'Clean Heads', 'Tension Check', 'Label',
+         'Unload Reel', 'Rework', 'Calibrate', 'Wait']
+
+
+class EventLogSpec:
+    """
+    Shape of a synthetic rewinding event log.
+
+    Variants are random step sequences whose frequencies follow a Zipf law, so a few
+    variants cover most cycles, as in the real logs.
+
+    Attributes
+    ----------
+    machines : int
+        Number of machines, named M001, M002, ...
+    variants : int
+        Number of distinct variants.
+    weeks : int
+        Number of distinct week numbers.
+    steps : int
+        Number of distinct step names, at most len(STEPS) unless numbered steps are wanted.
+    min_steps, max_steps : int
+        Bounds of the number of steps in a variant.
+    zipf : float
+        Skew of the variant frequencies.
+    seed : int
+        Seed of the random generator.
+    """
+
+    def __init__(self, machines=8, variants=200, weeks=52, steps=len(STEPS), min_steps=3, max_steps=9, zipf=1.2,
+                 seed=0):
+        self.machines = machines
+        self.variants = variants
+        self.weeks = weeks
+        self.steps = steps
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.zipf = zipf
+        self.seed = seed
+
+    def machine_names(self):
+        return np.array([f"M{i + 1:03d}" for i in range(self.machines)], dtype=object)
+
+    def step_names(self):
+        names = STEPS[:self.steps] + [f"Step {i}" for i in range(len(STEPS), self.steps)]
+        return np.array(names, dtype=object)
+
+    def variant_steps(self, rng):
+        """Returns the step sequence of every variant, most frequent first."""
+        names = self.step_names()
+        lengths = rng.integers(self.min_steps, self.max_steps + 1, size=self.variants)
+        return [list(names[rng.integers(0, len(names), size=n)]) for n in lengths]
+
+    def variant_weights(self):
+        weights = 1.0 / np.arange(1, self.variants + 1) ** self.zipf
+        return weights / weights.sum()
+
+
+def _cases(spec, n_cases, rng):
+    """Draws the machine, week and variant rank of n_cases cycles."""
+    return pd.DataFrame({
+        'Case ID': np.arange(1, n_cases + 1),
+        'machine': spec.machine_names()[rng.integers(0, spec.machines, size=n_cases)],
+        'week_number': rng.integers(1, spec.weeks + 1, size=n_cases),
+        'Variant Rank': rng.choice(np.arange(1, spec.variants + 1), size=n_cases, p=spec.variant_weights()),
+    })
+
+
+def all_variants(rows, spec=None, compact=True):
+    """
+    Generates an all_variants table: one row per cycle with its machine, week, variant,
+    variant rank and total duration.
+
+    Parameters
+    ----------
+        rows : int
+            Number of cycles.
+        spec : EventLogSpec, optional
+            Cardinalities of the log; defaults to EventLogSpec().
+        compact : bool, optional
+            Compact the frame as the TableStore does.
+
+    Returns
+    -------
+        DataFrame
+            The table.
+    """
+    spec = spec or EventLogSpec()
+    rng = np.random.default_rng(spec.seed)
+    variant_text = np.array([','.join(s) for s in spec.variant_steps(rng)], dtype=object)
+    df = _cases(spec, rows, rng)
+    df['Variant'] = variant_text[df['Variant Rank'].to_numpy() - 1]
+    df['Duration (Seconds)'] = rng.lognormal(mean=6.5, sigma=0.6, size=rows).round(1)
+    df = df.sort_values('Variant Rank', kind='stable', ignore_index=True)
+    return compact_frame(df)[0] if compact else df
+
+
+def machine_data(rows, spec=None, compact=True, machine=None):
+    """
+    Generates an M00x_Data event table: one row per step of a cycle with its step name,
+    timestamp, step duration and the cycle's variant, variant rank and week.
+
+    Cycles are generated until rows events exist; the last cycle may be cut short.
+
+    Parameters
+    ----------
+        rows : int
+            Number of events.
+        spec : EventLogSpec, optional
+            Cardinalities of the log; defaults to EventLogSpec().
+        compact : bool, optional
+            Compact the frame as the TableStore does.
+        machine : str, optional
+            Machine of every cycle; defaults to one drawn per cycle.
+
+    Returns
+    -------
+        DataFrame
+            The table.
+    """
+    spec = spec or EventLogSpec()
+    rng = np.random.default_rng(spec.seed)
+    variant_steps = spec.variant_steps(rng)
+    variant_text = np.array([','.join(s) for s in variant_steps], dtype=object)
+    lengths = np.array([len(s) for s in variant_steps])
+    mean_length = float(np.dot(lengths, spec.variant_weights()))
+    cases = _cases(spec, int(rows / mean_length) + spec.max_steps, rng)
+    if machine is not None:
+        cases['machine'] = machine
+
+    ranks = cases['Variant Rank'].to_numpy() - 1
+    case_lengths = lengths[ranks]
+    n_events = int(case_lengths.sum())
+    case_of_event = np.repeat(np.arange(len(cases)), case_lengths)
+    position = np.arange(n_events) - np.repeat(np.cumsum(case_lengths) - case_lengths, case_lengths)
+    flat_steps = np.array([step for steps in variant_steps for step in steps], dtype=object)
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+
+    durations = rng.lognormal(mean=4.0, sigma=0.8, size=n_events).round(1)
+    # events are timestamped at completion, one hour apart between cycle starts
+    case_start = pd.Timestamp('2024-01-01').value + np.arange(len(cases), dtype=np.int64) * 3_600_000_000_000
+    total = np.cumsum(durations)
+    first = np.cumsum(case_lengths) - case_lengths
+    elapsed = total - np.repeat(total[first] - durations[first], case_lengths)
+    df = pd.DataFrame({
+        'Case ID': cases['Case ID'].to_numpy()[case_of_event],
+        'machine': cases['machine'].to_numpy()[case_of_event],
+        'week_number': cases['week_number'].to_numpy()[case_of_event],
+        'concept:name': flat_steps[offsets[ranks][case_of_event] + position],
+        'time:timestamp': pd.to_datetime(case_start[case_of_event] + (elapsed * 1e9).astype(np.int64)),
+        'Duration (Seconds)': durations,
+        'Variant': variant_text[ranks][case_of_event],
+        'Variant Rank': ranks[case_of_event] + 1,
+    }).iloc[:rows]
+    df = df.sort_values('Variant Rank', kind='stable', ignore_index=True)
+    return compact_frame(df)[0] if compact else df
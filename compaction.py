@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+
+class StepCodec:
+    """
+    Interns process step names as small integers.
+
+    A variant string such as 'Load,Wind,Cut' is encoded once into a read-only int32
+    array of step codes; later lookups of the same variant return the same array.
+
+    Attributes
+    ----------
+    steps : list
+        Step names, indexed by their code.
+    """
+
+    def __init__(self, separator=','):
+        self.separator = separator
+        self.steps = []
+        self._codes = {}
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def step_code(self, step):
+        """Returns the code of a step name, assigning a new one if needed."""
+        code = self._codes.get(step)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(step)
+                if code is None:
+                    code = len(self.steps)
+                    self.steps.append(step)
+                    self._codes[step] = code
+        return code
+
+    def encode(self, variant_text):
+        """Returns the interned step-code array of a comma-joined variant string."""
+        sequence = self._variants.get(variant_text)
+        if sequence is None:
+            sequence = np.array([self.step_code(step) for step in str(variant_text).split(self.separator)],
+                                dtype=np.int32)
+            sequence.setflags(write=False)
+            self._variants[variant_text] = sequence
+        return sequence
+
+    def decode(self, sequence):
+        """Returns the step names of a step-code array."""
+        return [self.steps[code] for code in sequence]
+
+
+step_codec = StepCodec()
+
+
+def _compact_column(series, max_category_ratio):
+    """Returns series in its narrowest lossless representation."""
+    dtype = series.dtype
+    if isinstance(dtype, CategoricalDtype):
+        return series
+    if pd.api.types.is_bool_dtype(dtype):
+        return series
+    if pd.api.types.is_integer_dtype(dtype):
+        downcast = 'unsigned' if len(series) and series.min() >= 0 else 'integer'
+        return pd.to_numeric(series, downcast=downcast)
+    if pd.api.types.is_float_dtype(dtype):
+        narrow = pd.to_numeric(series, downcast='float')
+        # only keep float32 when no value changes
+        if narrow.dtype != dtype and narrow.astype(dtype).equals(series):
+            return narrow
+        return series
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        try:
+            n_unique = series.nunique(dropna=True)
+        except TypeError:
+            # unhashable cells (lists, dicts) stay as they are
+            return series
+        if len(series) and n_unique <= max_category_ratio * len(series):
+            return series.astype('category')
+    return series
+
+
+def compact_frame(df, max_category_ratio=0.5):
+    """
+    Converts a freshly loaded event log to a compact columnar representation.
+
+    Text columns whose distinct values are at most max_category_ratio of the rows become
+    categoricals, integer columns are downcast, and float columns are downcast only when
+    that is lossless.
+
+    Parameters
+    ----------
+        df : DataFrame
+            The frame built from the query response. It is not modified.
+        max_category_ratio : float, optional
+            Maximum distinct-to-rows ratio for a text column to become categorical.
+
+    Returns
+    -------
+        tuple
+            The compacted DataFrame and a memory report DataFrame indexed by column, with
+            'dtype_before', 'dtype_after', 'bytes_before' and 'bytes_after'.
+    """
+    compacted = pd.DataFrame({column: _compact_column(df[column], max_category_ratio) for column in df.columns},
+                             index=df.index)
+    report = pd.DataFrame({
+        'dtype_before': df.dtypes.astype(str),
+        'dtype_after': compacted.dtypes.astype(str),
+        'bytes_before': df.memory_usage(index=False, deep=True),
+        'bytes_after': compacted.memory_usage(index=False, deep=True),
+    })
+    return compacted, report
+
+
+def concat_compact(previous, delta, max_category_ratio=0.5):
+    """
+    Appends newly fetched rows to a compacted frame without losing its categoricals.
+
+    The categories of previous are extended in place of re-encoding its rows, and delta is
+    encoded against the union, so the append costs work proportional to delta.
+    """
+    delta, _ = compact_frame(delta, max_category_ratio)
+    previous_columns = {}
+    delta_columns = {}
+    for column in previous.columns:
+        dtype = previous[column].dtype
+        if not isinstance(dtype, CategoricalDtype) or column not in delta.columns:
+            continue
+        incoming = delta[column]
+        incoming_values = incoming.cat.categories if isinstance(incoming.dtype, CategoricalDtype) \
+            else pd.Index(incoming.dropna().unique())
+        new_categories = incoming_values.difference(dtype.categories)
+        if len(new_categories):
+            previous_columns[column] = previous[column].cat.add_categories(new_categories)
+        categories = previous_columns[column].dtype if column in previous_columns else dtype
+        delta_columns[column] = incoming.astype(object).astype(categories)
+    if previous_columns:
+        previous = previous.assign(**previous_columns)
+    if delta_columns:
+        delta = delta.assign(**delta_columns)
+    return pd.concat([previous, delta], ignore_index=True)
@@ -1,7 +1,359 @@
+import threading
+from collections import OrderedDict
+
 import streamlit as st
 from streamlit.errors import StreamlitAPIException
+import numpy as np
 import pandas as pd
 
+from frame_memo import dataframe_fingerprint, derived, on_forget, share_frame, source_frame
+from instrumentation import profiler
+
+
+class FilterEngine:
+    """
+    A bitmask index over the filter columns of a dataframe.
+
+    The engine is built once per dataframe. Each filter column is factorized into integer
+    codes (sorted, so code order is option order), reusing the codes of categorical
+    columns as they are, and a selection is turned into a boolean
+    row mask with a single lookup-table gather. Filtered views and leave-one-out option
+    lists are answered by combining those masks, without copying the dataframe.
+
+    Attributes
+    ----------
+    n_rows : int
+        Number of rows in the indexed dataframe.
+    columns : list
+        The indexed column names.
+
+    Methods
+    -------
+    mask(selections, except_filter=None):
+        Returns the combined row mask for the selections, or None if nothing is selected.
+    options(column, selections=None, row_mask=None):
+        Returns the sorted values of column still reachable under the other selections.
+    leave_one_out(selections):
+        Returns, for every column, the row mask of all selections except that column's own.
+    """
+
+    def __init__(self, df, columns):
+        """
+        Builds the per-column code indexes.
+
+        Parameters
+        ----------
+            df : DataFrame
+                The dataframe to index. It is not copied or modified.
+            columns : list
+                Column names in df to index.
+        """
+        self.n_rows = len(df)
+        self.columns = list(columns)
+        self._codes = {}
+        self._uniques = {}
+        self._lookup = {}
+        self._na_code = {}
+        self._mask_cache = {}
+        for column in self.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                codes, uniques = _category_codes(df[column])
+            else:
+                try:
+                    codes, uniques = pd.factorize(df[column], sort=True, use_na_sentinel=False)
+                except TypeError:
+                    # mixed, unorderable values: keep order of appearance
+                    codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            self._codes[column] = codes
+            self._uniques[column] = uniques
+            lookup = {}
+            na_code = None
+            for code, value in enumerate(uniques.tolist()):
+                if pd.isna(value):
+                    na_code = code
+                else:
+                    lookup[value] = code
+            self._lookup[column] = lookup
+            self._na_code[column] = na_code
+
+    def _code_of(self, column, value):
+        """Returns the code of value in column, or None if the value does not occur."""
+        try:
+            if pd.isna(value):
+                return self._na_code[column]
+        except (TypeError, ValueError):
+            pass
+        try:
+            return self._lookup[column].get(value)
+        except TypeError:
+            return None
+
+    def column_mask(self, column, values):
+        """
+        Returns the boolean row mask of rows whose column value is in values.
+
+        The last mask built for each column is kept, so re-asking for an unchanged
+        selection costs a tuple comparison.
+        """
+        key = tuple(values)
+        cached = self._mask_cache.get(column)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        selected = np.zeros(len(self._uniques[column]), dtype=bool)
+        for value in values:
+            code = self._code_of(column, value)
+            if code is not None:
+                selected[code] = True
+        mask = selected[self._codes[column]]
+        self._mask_cache[column] = (key, mask)
+        return mask
+
+    def mask(self, selections, except_filter=None):
+        """
+        Combines the masks of all active selections except the specified filter.
+
+        Parameters
+        ----------
+            selections : dict
+                Filter names mapped to their selected values.
+            except_filter : str, optional
+                The filter name to leave out of the combination.
+
+        Returns
+        -------
+            ndarray or None
+                Boolean row mask, or None when no selection applies.
+        """
+        combined = None
+        for column, values in selections.items():
+            if column == except_filter or not values:
+                continue
+            column_mask = self.column_mask(column, values)
+            combined = column_mask.copy() if combined is None else np.logical_and(combined, column_mask, out=combined)
+        return combined
+
+    def leave_one_out(self, selections):
+        """
+        Returns the leave-one-out mask of every indexed column in one pass.
+
+        Prefix and suffix conjunctions are combined so the work is linear in the number of
+        filters instead of quadratic. A value of None means no other selection applies.
+        """
+        columns = self.columns
+        masks = [self.column_mask(c, selections[c]) if selections.get(c) else None for c in columns]
+        prefix = [None] * (len(columns) + 1)
+        suffix = [None] * (len(columns) + 1)
+        for i, m in enumerate(masks):
+            prefix[i + 1] = _and(prefix[i], m)
+        for i in range(len(columns) - 1, -1, -1):
+            suffix[i] = _and(suffix[i + 1], masks[i])
+        return {c: _and(prefix[i], suffix[i + 1]) for i, c in enumerate(columns)}
+
+    def options(self, column, selections=None, row_mask=None):
+        """
+        Returns the sorted option list of column under the other selections.
+
+        Parameters
+        ----------
+            column : str
+                The filter column.
+            selections : dict, optional
+                Current selections; the column's own selection is ignored.
+            row_mask : ndarray, optional
+                A precomputed leave-one-out mask to use instead of selections.
+
+        Returns
+        -------
+            list
+                The values of column present in the remaining rows.
+        """
+        if row_mask is None and selections:
+            row_mask = self.mask(selections, except_filter=column)
+        uniques = self._uniques[column]
+        if row_mask is None:
+            return uniques.tolist()
+        present = np.zeros(len(uniques), dtype=bool)
+        present[self._codes[column][row_mask]] = True
+        return uniques[present].tolist()
+
+
+def _category_codes(series):
+    """
+    Returns the codes and option values of a categorical column without re-factorizing.
+
+    Codes are remapped only when the categories are not already sorted, and missing values
+    get a code after the last category.
+    """
+    categories = series.cat.categories
+    codes = series.cat.codes.to_numpy()
+    if not categories.is_monotonic_increasing:
+        try:
+            order = categories.argsort()
+        except TypeError:
+            order = None
+        if order is not None:
+            rank = np.empty(len(order), dtype=codes.dtype)
+            rank[order] = np.arange(len(order))
+            codes = np.where(codes < 0, codes, rank[codes])
+            categories = categories[order]
+    missing = codes < 0
+    if missing.any():
+        codes = np.where(missing, len(categories), codes.astype(np.intp))
+        categories = categories.append(pd.Index([np.nan]))
+    return codes, pd.Index(categories)
+
+
+def _window(df, sort_by, ascending, start, size):
+    """
+    Returns rows start to start + size of df, in the order of sort_by.
+
+    Sort orders are derived once per dataframe, so paging through a cached filter result
+    sorts it only once.
+    """
+    if sort_by is None:
+        return df.iloc[start:start + size]
+    order = derived(df, ('sort_order', sort_by, ascending), lambda d: _sort_order(d, sort_by, ascending))
+    return df.iloc[order[start:start + size]]
+
+
+def _sort_order(df, sort_by, ascending):
+    """Returns the row positions of df in the stable order of sort_by, missing values last."""
+    positions = df[sort_by].reset_index(drop=True)
+    return positions.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+
+def _and(left, right):
+    """Conjunction of two optional masks, where None stands for all rows."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return left & right
+
+
+def normalize_selection(selections, except_filter=None):
+    """
+    Returns a hashable, order-independent form of a filter selection.
+
+    Empty selections and except_filter are dropped, so every selection that produces the
+    same filtered view maps to the same key.
+    """
+    return tuple(sorted(
+        (name, tuple(sorted(set(values), key=repr)))
+        for name, values in selections.items()
+        if name != except_filter and values
+    ))
+
+
+class FilterResultCache:
+    """
+    A process-wide LRU cache of filtered dataframes.
+
+    Entries are keyed by (dataframe fingerprint, normalized selection) and evicted least
+    recently used first once either the entry count or the memory cap is exceeded.
+    Cached frames must not be modified in place; DynamicFilters hands out copies of them.
+
+    Attributes
+    ----------
+    max_entries : int
+        Maximum number of cached results.
+    max_bytes : int
+        Maximum total memory of cached results, in bytes.
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that had to be computed.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=256 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # reentrant: purge runs from weakref callbacks, which may fire while the lock is held
+        self._lock = threading.RLock()
+
+    @property
+    def nbytes(self):
+        """Total memory held by cached results, in bytes."""
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the cached result for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df):
+        """Stores df under key and evicts old entries to respect the caps."""
+        # shallow size: object cells are shared with the source frame
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (df, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def purge(self, fingerprint):
+        """Drops the cached results of the dataframe with this fingerprint."""
+        with self._lock:
+            for key in [k for k in list(self._entries) if k[0] == fingerprint]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """Drops every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+result_cache = FilterResultCache()
+
+_engines = OrderedDict()
+_engines_lock = threading.RLock()
+_MAX_ENGINES = 8
+
+
+def _shared_engine(df, columns, fingerprint):
+    """Returns a FilterEngine for df, reusing the one built for the same fingerprint."""
+    key = (fingerprint, tuple(columns))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            _engines.move_to_end(key)
+            return engine
+    engine = FilterEngine(df, columns)
+    with _engines_lock:
+        _engines[key] = engine
+        while len(_engines) > _MAX_ENGINES:
+            _engines.popitem(last=False)
+    return engine
+
+
+@on_forget
+def _forget_engines(fingerprint):
+    """Drops the filter engines and the cached results of a collected dataframe."""
+    with _engines_lock:
+        for engine_key in [k for k in list(_engines) if k[0] == fingerprint]:
+            del _engines[engine_key]
+    result_cache.purge(fingerprint)
+
 
 class DynamicFilters:
     """
@@ -15,18 +367,22 @@ class DynamicFilters:
         The dataframe on which filters are applied.
     filters : dict
         Dictionary with filter names as keys and their selected values as values.
+    source : PushdownSource or None
+        The query source used in pushdown mode.
 
     Methods
     -------
     check_state():
         Initializes the session state with filters if not already set.
+    engine:
+        The FilterEngine indexing df, built on first use.
     filter_df(except_filter=None):
         Returns the dataframe filtered based on session state excluding the specified filter.
     display():
         Renders the dynamic filters and the filtered dataframe in Streamlit.
     """
 
-    def __init__(self, df, filters, filters_name='filters', identifier='default'):
+    def __init__(self, df, filters, filters_name='filters', identifier='default', cache=result_cache, source=None):
         """
         Constructs all the necessary attributes for the DynamicFilters object.
 
@@ -38,12 +394,41 @@ class DynamicFilters:
                 List of columns names in df for which filters are to be created.
             filters_name: str, optional
                 Name of the filters object in session state.
+            cache : FilterResultCache, optional
+                Cache for filtered results. Defaults to the process-wide result_cache;
+                pass None to disable caching.
+            source : PushdownSource, optional
+                Enables pushdown mode: filtered results and option lists are queried from
+                the source instead of computed from df, which may then be None.
         """
         self.df = df
+        self.source = source
         self.filters_name = f"{identifier}_{filters_name}"  # Modify filters_name to include the identifier
         self.filters = {filter_name: [] for filter_name in filters}
+        self.cache = cache
+        self._engine = None
+        self._fingerprint = None
         self.check_state()
 
+    @property
+    def fingerprint(self):
+        """The identity fingerprint of df."""
+        if self._fingerprint is None:
+            self._fingerprint = dataframe_fingerprint(self.df)
+        return self._fingerprint
+
+    @property
+    def engine(self):
+        """The FilterEngine over df, shared between reruns that load identical data."""
+        if self._engine is None:
+            columns = list(st.session_state[self.filters_name].keys())
+            with profiler.stage('filter_index_build'):
+                if self.cache is None:
+                    self._engine = FilterEngine(self.df, columns)
+                else:
+                    self._engine = _shared_engine(source_frame(self.df), columns, self.fingerprint)
+        return self._engine
+
     def check_state(self):
         """Initializes the session state with filters if not already set."""
         # if 'filters' not in st.session_state:
@@ -63,15 +448,34 @@ class DynamicFilters:
         Returns
         -------
             DataFrame
-                Filtered dataframe.
+                Filtered dataframe. Cached results are handed out as copies of their own
+                (see share_frame), so in-place writes never reach other callers.
         """
-        filtered_df = self.df.copy()
-        for key, values in st.session_state[self.filters_name].items():
-            if key != except_filter and values:
-                filtered_df = filtered_df[filtered_df[key].isin(values)]
-        return filtered_df
-
-    def display_filters(self, location=None, num_columns=0, gap="small"):
+        with profiler.stage('filter_df'):
+            return self._filter_df(except_filter)
+
+    def _filter_df(self, except_filter):
+        selections = st.session_state[self.filters_name]
+        if self.source is not None:
+            return self.source.fetch(selections, except_filter)
+        if self.cache is None:
+            key = None
+        else:
+            key = (self.fingerprint, normalize_selection(selections, except_filter))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return share_frame(cached)
+        mask = self.engine.mask(selections, except_filter)
+        if mask is None:
+            return self.df
+        if key is None:
+            return self.df[mask]
+        # cached results are shared by every frame with this fingerprint, so take the rows from the source
+        filtered_df = source_frame(self.df)[mask]
+        self.cache.put(key, filtered_df)
+        return share_frame(filtered_df)
+
+    def display_filters(self, location=None, num_columns=0, gap="small", apply_mode="instant"):
         """
             Renders dynamic multiselect filters for user selection.
 
@@ -100,6 +504,14 @@ class DynamicFilters:
                 - 'large': Maximum gap between columns.
                 Default is 'small'.
 
+            apply_mode : str, optional
+                When selections take effect. Accepted values are:
+                - 'instant': Every change is applied immediately and triggers a rerun.
+                - 'batch': Selections are staged in a form and applied together with an "Apply filters"
+                  button. Invalidated selections are pruned to a fixpoint before the filters are drawn,
+                  so each user action causes at most the single rerun of the form submission.
+                Default is 'instant'.
+
             Behavior:
             ---------
             - The function iterates through session-state filters.
@@ -136,6 +548,12 @@ class DynamicFilters:
             raise StreamlitAPIException("num_columns must be greater than 0 when location is 'columns'")
         if gap not in ['small', 'medium', 'large']:
             raise StreamlitAPIException("gap must be either 'small', 'medium' or 'large'")
+        if apply_mode not in ['instant', 'batch']:
+            raise StreamlitAPIException("apply_mode must be either 'instant' or 'batch'")
+
+        if apply_mode == 'batch':
+            self._display_filters_batch(location, num_columns, gap)
+            return
 
         filters_changed = False
 
@@ -145,9 +563,9 @@ class DynamicFilters:
             max_value = num_columns
             col_list = st.columns(num_columns, gap=gap)
 
+        row_masks = self._row_masks(st.session_state[self.filters_name])
         for filter_name in st.session_state[self.filters_name].keys():
-            filtered_df = self.filter_df(filter_name)
-            options = filtered_df[filter_name].sort_values(ascending=True).unique().tolist()
+            options = self._options(filter_name, st.session_state[self.filters_name], row_masks)
 
             # Remove selected values that are not in options anymore
             valid_selections = [v for v in st.session_state[self.filters_name][filter_name] if v in options]
@@ -177,13 +595,141 @@ class DynamicFilters:
                 st.session_state[self.filters_name][filter_name] = selected
                 filters_changed = True
 
+            if filters_changed:
+                # the remaining filters' options depend on the changed selection
+                row_masks = self._row_masks(st.session_state[self.filters_name])
+
         if filters_changed:
             st.rerun()
 
-    def display_df(self, **kwargs):
-        """Renders the filtered dataframe in the main area."""
-        # Display filtered DataFrame
-        st.dataframe(self.filter_df(), **kwargs)
+    def _row_masks(self, selections):
+        """
+        Returns the leave-one-out row mask of every filter, from one pass over the
+        selections, or None in pushdown mode.
+        """
+        if self.source is not None:
+            return None
+        with profiler.stage('filter_options'):
+            return self.engine.leave_one_out(selections)
+
+    def _options(self, filter_name, selections, row_masks=None):
+        """
+        Returns the options of a filter under the other filters' selections.
+
+        row_masks, as returned by _row_masks for the same selections, saves recombining
+        the other filters' masks for every filter.
+        """
+        with profiler.stage('filter_options'):
+            if self.source is not None:
+                return self.source.distinct(filter_name, selections)
+            if row_masks is not None:
+                return self.engine.options(filter_name, row_mask=row_masks[filter_name])
+            return self.engine.options(filter_name, selections)
+
+    def converge(self, selections):
+        """
+        Prunes selections until every selected value is still an option.
+
+        Removing a value from one filter can shrink the options of another, so passes are
+        repeated until nothing changes. Selections only shrink, so this terminates.
+
+        Parameters
+        ----------
+            selections : dict
+                Filter names mapped to their selected values; it is updated in place.
+
+        Returns
+        -------
+            dict
+                The options of every filter under the converged selections.
+        """
+        while True:
+            changed = False
+            options = {}
+            row_masks = self._row_masks(selections)
+            for filter_name, values in selections.items():
+                options[filter_name] = self._options(filter_name, selections, row_masks)
+                valid_selections = [v for v in values if v in options[filter_name]]
+                if valid_selections != values:
+                    selections[filter_name] = valid_selections
+                    changed = True
+                    # the remaining filters' options depend on the pruned selection
+                    row_masks = self._row_masks(selections)
+            if not changed:
+                return options
+
+    def _display_filters_batch(self, location, num_columns, gap):
+        """Renders the filters as a form whose staged selections are applied on submit."""
+        selections = st.session_state[self.filters_name]
+        synced_key = f"{self.filters_name}_synced"
+        synced = st.session_state.get(synced_key, {})
+        # a staged widget value that differs from what was last drawn is a submitted user change
+        for filter_name in selections:
+            widget_key = f"{self.filters_name}_{filter_name}_staged"
+            staged = st.session_state.get(widget_key)
+            if staged is not None and staged != synced.get(filter_name):
+                selections[filter_name] = list(staged)
+
+        options = self.converge(selections)
+        for filter_name, values in selections.items():
+            st.session_state[f"{self.filters_name}_{filter_name}_staged"] = list(values)
+        st.session_state[synced_key] = {name: list(values) for name, values in selections.items()}
+
+        container = st.sidebar if location == 'sidebar' else st
+        with container.form(key=f"{self.filters_name}_form", border=False):
+            col_list = st.columns(num_columns, gap=gap) if location == 'columns' and num_columns > 0 else None
+            for i, filter_name in enumerate(selections):
+                target = col_list[i % num_columns] if col_list else st.container()
+                with target:
+                    st.multiselect(f"Select {filter_name}", options[filter_name],
+                                   key=f"{self.filters_name}_{filter_name}_staged")
+            st.form_submit_button("Apply filters")
+
+    def display_df(self, page_size=None, **kwargs):
+        """
+        Renders the filtered dataframe in the main area.
+
+        Parameters
+        ----------
+            page_size : int, optional
+                Enables the windowed mode: only one page of this many rows is sent to the
+                browser, with controls for the page, the sort column and the shown columns.
+                Sorting and paging happen on the server. Default None sends the whole frame.
+            **kwargs
+                Passed on to st.dataframe.
+        """
+        filtered_df = self.filter_df()
+        if page_size is None:
+            # Display filtered DataFrame
+            st.dataframe(filtered_df, **kwargs)
+            return
+        if not isinstance(page_size, int) or page_size <= 0:
+            raise StreamlitAPIException("page_size must be a positive integer")
+
+        n_rows = len(filtered_df)
+        n_pages = max(1, -(-n_rows // page_size))
+        page_key = f"{self.filters_name}_view_page"
+        # clamp a page left over from a larger selection before the widget reads it
+        if st.session_state.get(page_key, 1) > n_pages:
+            st.session_state[page_key] = n_pages
+
+        all_columns = list(filtered_df.columns)
+        columns_col, sort_col, order_col, page_col = st.columns([4, 2, 1, 1])
+        with columns_col:
+            columns = st.multiselect("Columns", all_columns, default=all_columns,
+                                     key=f"{self.filters_name}_view_columns")
+        with sort_col:
+            sort_by = st.selectbox("Sort by", [None] + all_columns, key=f"{self.filters_name}_view_sort",
+                                   format_func=lambda c: "(unsorted)" if c is None else str(c))
+        with order_col:
+            ascending = st.checkbox("Ascending", value=True, key=f"{self.filters_name}_view_ascending")
+        with page_col:
+            page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key=page_key)
+
+        start = (int(page) - 1) * page_size
+        window = _window(filtered_df, sort_by, ascending, start, page_size)
+        st.dataframe(window[columns] if columns else window, **kwargs)
+        st.caption(f"Rows {min(start + 1, n_rows)}–{start + len(window)} of {n_rows}")
 
     # Add the get_filter_value method here
     def get_filter_value(self, filter_name):
@@ -203,6 +749,17 @@ class DynamicFilters:
         # Return the current value(s) for the filter name, defaulting to an empty list if not set
         return st.session_state[self.filters_name].get(filter_name, [])
 
+    def get_filter_values(self):
+        """
+        Gets the current values of all filters.
+
+        Returns
+        -------
+        dict
+            Filter names mapped to the list of values currently selected for them.
+        """
+        return {name: list(values) for name, values in st.session_state[self.filters_name].items()}
+
     def set_default_values(self, default_values):
         """
         Sets the default values for the filters.
@@ -0,0 +1,450 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import streamlit as st
+import pandas as pd
+
+from compaction import compact_frame, concat_compact
+from disk_cache import DiskTableCache
+from frame_memo import carry_derived, share_frame
+from instrumentation import profiler
+from supabase_pushdown import execute_query, table_columns
+
+
+class TableSnapshot:
+    """
+    One loaded version of a table.
+
+    Attributes
+    ----------
+    table : str
+        The table name.
+    version : int
+        Increases every time the table is reloaded.
+    df : DataFrame
+        The table contents. The frame stays with the store; callers get copies of it
+        from frame.
+    loaded_at : float
+        time.monotonic() at which the snapshot was loaded or last revalidated.
+    watermark : object
+        Highest value of the table's watermark column, or None for full-reload tables.
+    memory_report : DataFrame or None
+        Per-column memory before and after compaction of the rows loaded so far (see
+        compact_frame), or None if the table was not compacted.
+    """
+
+    def __init__(self, table, version, df, watermark=None, memory_report=None):
+        self.table = table
+        self.version = version
+        self.df = df
+        self.watermark = watermark
+        self.memory_report = memory_report
+        self.loaded_at = time.monotonic()
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def sorted_by(self, column):
+        """
+        Returns df stably sorted by column, computed once per snapshot.
+
+        A table the store keeps in this order (see TableStore) is returned as it is, so
+        a frame memory-mapped from disk is served without materializing a sorted copy.
+        """
+        if column is None or column not in self.df.columns:
+            return self.df
+        with self._lock:
+            derived = self._derived.get(('sort', column))
+            if derived is None:
+                if self.df[column].is_monotonic_increasing:
+                    derived = self.df
+                else:
+                    derived = self.df.sort_values(by=column, kind='stable')
+                self._derived[('sort', column)] = derived
+            return derived
+
+    def frame(self, column=None):
+        """
+        Returns a copy of df of the caller's own, optionally sorted by column.
+
+        The copy is shallow (see share_frame): it costs no data copy, in-place writes to it
+        never reach df or another caller's copy, and the values derived from it, like
+        filter indexes, KPI cubes and sort orders, are shared by every copy of this
+        snapshot sorted by the same column.
+        """
+        return share_frame(self.sorted_by(column))
+
+    def partition_index(self, column):
+        """Returns the values of column mapped to their row positions, computed once."""
+        with self._lock:
+            index = self._derived.get(('partition', column))
+            if index is None:
+                index = self.df.groupby(column, observed=True, dropna=False, sort=False).indices
+                self._derived[('partition', column)] = index
+            return index
+
+
+class TableStore:
+    """
+    A process-wide table cache shared by every session of the app.
+
+    Concurrent requests for a table that is not loaded yet are collapsed into a single
+    in-flight fetch, and every caller receives a copy of the same snapshot until the ttl
+    expires, so N sessions looking at one machine table cause one backend query.
+
+    Append-only tables registered in watermarks are refreshed incrementally: when the ttl
+    expires only rows above the snapshot's high-water mark are fetched and appended. The
+    appended rows are merged into the table's order, and aggregates registered with
+    frame_memo.extends, such as KPI cubes, are extended with them instead of rebuilt. The
+    comparison is strict, so a row that arrives after a refresh with a watermark value
+    equal to or below the snapshot's (a late event sharing the last timestamp, or one
+    with an older timestamp) is never fetched. It only appears after a full reload, which
+    happens after invalidate(), which drops the disk copy as well, or when no snapshot is
+    held in memory or on disk.
+
+    Tables with the order_by column are kept stably sorted by it, so their disk copy is
+    already in the order the pages ask for and get(table, sort_by=order_by) costs no sort.
+
+    With a DiskTableCache, every new snapshot is also written to disk. A process that has
+    no snapshot of a table yet serves the disk copy immediately and revalidates it against
+    the backend in a background thread; callers keep getting the disk copy until the
+    revalidated snapshot replaces it.
+
+    Attributes
+    ----------
+    ttl : float
+        Seconds a snapshot is served before it is reloaded.
+    fetches : int
+        Number of full table loads that reached the backend.
+    delta_fetches : int
+        Number of incremental refreshes that reached the backend.
+    hits : int
+        Number of snapshot requests served without waiting on the backend.
+    misses : int
+        Number of snapshot requests that had to wait for a load.
+    """
+
+    def __init__(self, loader, ttl=600, delta_loader=None, watermarks=None, compact=True, disk_cache=None,
+                 keys=None, order_by=None):
+        """
+        Parameters
+        ----------
+            loader : callable
+                Called with (table, key), returns the table as a DataFrame; key is the
+                table's entry in keys, or None.
+            ttl : float, optional
+                Seconds a snapshot is served before it is reloaded.
+            delta_loader : callable, optional
+                Called with (table, column, watermark, key), returns the rows whose column
+                value is strictly greater than watermark.
+            watermarks : dict, optional
+                Append-only table names mapped to a strictly increasing column (primary key
+                or insertion timestamp) used as their high-water mark.
+            compact : bool, optional
+                Convert loaded tables to categoricals and narrow dtypes with compact_frame.
+            disk_cache : DiskTableCache, optional
+                Persistent cache used for cold starts.
+            keys : dict, optional
+                Table names mapped to the columns that identify a row, which loads are
+                paged in.
+            order_by : str, optional
+                Column that loaded tables having it are kept stably sorted by.
+        """
+        self.ttl = ttl
+        self.compact = compact
+        self.fetches = 0
+        self.delta_fetches = 0
+        self.hits = 0
+        self.misses = 0
+        self.watermarks = dict(watermarks or {})
+        self.keys = dict(keys or {})
+        self.order_by = order_by
+        self._loader = loader
+        self._delta_loader = delta_loader
+        self.disk_cache = disk_cache
+        self._snapshots = {}
+        self._inflight = {}
+        self._revalidating = set()
+        self._lock = threading.Lock()
+
+    def snapshot(self, table):
+        """
+        Returns the current snapshot of table, loading it if needed.
+
+        Raises whatever the loader raises; the failure is delivered to every caller that
+        was waiting on the same fetch.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(table)
+            if snapshot is not None and (time.monotonic() - snapshot.loaded_at < self.ttl
+                                         or table in self._revalidating):
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            future = self._inflight.get(table)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[table] = future
+        if not owner:
+            return future.result()
+        try:
+            stale = snapshot
+            if stale is None and self.disk_cache is not None:
+                stale = self._read_disk(table)
+            if stale is not None and snapshot is None:
+                # cold start from disk: answer now, revalidate in the background
+                with self._lock:
+                    self._snapshots[table] = stale
+                    self._revalidating.add(table)
+                    self._inflight.pop(table, None)
+                future.set_result(stale)
+                threading.Thread(target=self._revalidate, args=(table, stale), daemon=True).start()
+                return stale
+            snapshot = self._refresh(table, snapshot)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(table, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._snapshots[table] = snapshot
+            self._inflight.pop(table, None)
+        future.set_result(snapshot)
+        self._persist(snapshot, stale)
+        return snapshot
+
+    def peek(self, table):
+        """
+        Returns the snapshot of table if it can be served without waiting on the backend,
+        and None otherwise.
+
+        A snapshot held in memory is returned even when its ttl has expired, and a disk copy
+        is served (and revalidated in the background) as snapshot would. Nothing is loaded
+        from the backend.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(table)
+        if snapshot is not None:
+            return snapshot
+        if self.disk_cache is not None and self.disk_cache.metadata(table) is not None:
+            return self.snapshot(table)
+        return None
+
+    def _read_disk(self, table):
+        """Returns a stale snapshot of table from the disk cache, or None."""
+        cached = self.disk_cache.read(table)
+        if cached is None:
+            return None
+        df, metadata = cached
+        report = metadata.get('memory_report')
+        snapshot = TableSnapshot(table, metadata.get('version', 0), df, watermark=metadata.get('watermark'),
+                                 memory_report=pd.DataFrame(report) if report else None)
+        snapshot.loaded_at = float('-inf')
+        return snapshot
+
+    def _revalidate(self, table, stale):
+        """Refreshes a snapshot served from disk and swaps in the result."""
+        snapshot = None
+        try:
+            snapshot = self._refresh(table, stale)
+        except Exception as e:
+            # keep serving the disk copy; the next request after this retries in the foreground
+            print(f"Revalidating table {table} failed: {e}")
+        with self._lock:
+            if snapshot is not None:
+                self._snapshots[table] = snapshot
+            self._revalidating.discard(table)
+        if snapshot is not None:
+            self._persist(snapshot, stale)
+
+    def _persist(self, snapshot, previous):
+        """Writes a new snapshot to the disk cache in the background."""
+        if self.disk_cache is not None and snapshot is not previous:
+            self.disk_cache.write_async(snapshot.table, snapshot.df, snapshot.version, snapshot.watermark,
+                                        snapshot.memory_report)
+
+    def _refresh(self, table, previous):
+        """Builds the next snapshot of table, with a delta fetch when possible."""
+        column = self.watermarks.get(table)
+        if (previous is not None and column and self._delta_loader is not None
+                and previous.watermark is not None):
+            key = [c for c in self.keys.get(table) or () if c in previous.df.columns]
+            delta = self._delta_loader(table, column, previous.watermark, key)
+            self.delta_fetches += 1
+            if delta.empty:
+                # nothing new: keep serving the same snapshot so downstream caches stay warm
+                previous.loaded_at = time.monotonic()
+                return previous
+            if self.compact:
+                df = concat_compact(previous.df, delta)
+            else:
+                df = pd.concat([previous.df, delta], ignore_index=True)
+            appended = df.iloc[len(previous.df):]
+            snapshot = TableSnapshot(table, previous.version + 1, self._merged(df, len(previous.df)),
+                                     watermark=_max_value(delta[column], previous.watermark),
+                                     memory_report=_extended_report(previous.memory_report, delta, df))
+            # aggregates such as KPI cubes are extended with the appended rows instead of rebuilt
+            carry_derived(previous.df, snapshot.df, appended)
+            return snapshot
+        df = self._loader(table, self.keys.get(table))
+        self.fetches += 1
+        memory_report = None
+        if self.compact:
+            with profiler.stage('compaction'):
+                df, memory_report = compact_frame(df)
+        watermark = _max_value(df[column]) if column and column in df.columns else None
+        return TableSnapshot(table, previous.version + 1 if previous else 1, self._ordered(df),
+                             watermark=watermark, memory_report=memory_report)
+
+    def _merged(self, df, start):
+        """
+        Returns df, whose rows up to start are already ordered, stably sorted by order_by.
+
+        Only the rows from start on are sorted; they are merged into the ordered rows by
+        binary search, so an incremental refresh sorts the appended rows, not the table.
+        """
+        if self.order_by is None or self.order_by not in df.columns:
+            return df
+        if not df[self.order_by].iloc[:start].is_monotonic_increasing:
+            return self._ordered(df)
+        with profiler.stage('table_sort'):
+            values = df[self.order_by].to_numpy()
+            tail = np.argsort(values[start:], kind='stable')
+            positions = np.searchsorted(values[:start], values[start:][tail], side='right')
+            order = np.insert(np.arange(start), positions, start + tail)
+            if (order == np.arange(len(order))).all():
+                return df
+            return df.take(order).reset_index(drop=True)
+
+    def _ordered(self, df):
+        """Returns df stably sorted by order_by, or df itself when it has no such column or already is."""
+        if self.order_by is None or self.order_by not in df.columns or df[self.order_by].is_monotonic_increasing:
+            return df
+        with profiler.stage('table_sort'):
+            return df.sort_values(self.order_by, kind='stable', ignore_index=True)
+
+    def memory_reports(self):
+        """Returns the tables held in memory mapped to their compaction reports, where they have one."""
+        with self._lock:
+            return {table: snapshot.memory_report for table, snapshot in self._snapshots.items()
+                    if snapshot.memory_report is not None}
+
+    def set_watermarks(self, watermarks):
+        """Registers more append-only tables, mapping table names to watermark columns."""
+        with self._lock:
+            self.watermarks.update(watermarks)
+
+    def set_keys(self, keys):
+        """Registers the key columns of more tables, mapping table names to column tuples."""
+        with self._lock:
+            self.keys.update(keys)
+
+    def is_fresh(self, table):
+        """Returns whether a snapshot of table can be served without waiting on the backend."""
+        with self._lock:
+            snapshot = self._snapshots.get(table)
+            return snapshot is not None and (time.monotonic() - snapshot.loaded_at < self.ttl
+                                             or table in self._revalidating)
+
+    def get(self, table, sort_by=None):
+        """
+        Returns a copy of table of the caller's own, optionally sorted by a column.
+
+        See TableSnapshot.frame: every call returns a new shallow copy, so in-place writes
+        never reach the frames other sessions see, while caches keyed by the frame's
+        fingerprint stay shared per table version and sort column.
+        """
+        return self.snapshot(table).frame(sort_by)
+
+    def invalidate(self, table=None):
+        """
+        Forgets the snapshot of table, or of every table, in memory and on disk, so the next
+        get reloads it in full from the backend.
+        """
+        with self._lock:
+            if table is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(table, None)
+        if self.disk_cache is not None:
+            for name in self.disk_cache.tables() if table is None else [table]:
+                self.disk_cache.invalidate(name)
+
+
+def _extended_report(report, delta, df):
+    """Returns a compaction report updated for delta, as fetched, being appended to make df."""
+    if report is None:
+        return None
+    report = report.reindex(df.columns)
+    report['dtype_after'] = df.dtypes.astype(str)
+    report['bytes_before'] = report['bytes_before'].add(delta.memory_usage(index=False, deep=True), fill_value=0)
+    report['bytes_after'] = df.memory_usage(index=False, deep=True)
+    return report
+
+
+def _max_value(values, floor=None):
+    """Returns the largest non-null value as a plain Python object, or floor."""
+    values = values.dropna()
+    if values.empty:
+        return floor
+    top = values.max()
+    top = top.item() if hasattr(top, 'item') else top
+    return top if floor is None or top > floor else floor
+
+
+def load_table(conn, table, key=None):
+    """
+    Fetches a whole Supabase table, page by page, into a DataFrame.
+
+    Pages are ranges of a result ordered by key, the columns that identify a row: without
+    an order the database may return rows in a different order for every page, repeating
+    some rows and skipping others. With no key, or a key naming columns the table does not
+    have, the table is ordered by all its columns.
+    """
+    columns = table_columns(conn, table)
+    order_by = tuple(key) if key and all(c in columns for c in key) else tuple(columns)
+    rows = execute_query(conn, table, order_by=order_by)
+    with profiler.stage('dataframe_build'):
+        return pd.DataFrame(rows)
+
+
+def load_rows_after(conn, table, column, watermark, key=None):
+    """
+    Fetches the rows of table whose column value is greater than watermark, ordered by
+    column and then by key.
+
+    Rows whose column value equals watermark are not fetched again, which also skips
+    rows inserted after the last fetch with that same value; see TableStore.
+    """
+    order_by = (column, *[c for c in key or () if c != column])
+    rows = execute_query(conn, table, predicates=((column, 'gt', watermark),), order_by=order_by)
+    with profiler.stage('dataframe_build'):
+        return pd.DataFrame(rows)
+
+
+@st.cache_resource(show_spinner=False)
+def get_table_store(_conn, ttl=600, watermarks=None, cache_dir=None, keys=None, order_by=None):
+    """
+    Returns the process-wide TableStore for the connection.
+
+    Parameters
+    ----------
+        ttl : float, optional
+            Seconds a snapshot is served before it is refreshed.
+        watermarks : tuple, optional
+            (table, column) pairs of append-only tables to refresh incrementally.
+        cache_dir : str, optional
+            Directory of the persistent DiskTableCache; None keeps tables in memory only.
+        keys : tuple, optional
+            (table, columns) pairs naming the columns that identify a row of a table.
+        order_by : str, optional
+            Column that tables having it are kept sorted by, in memory and on disk.
+    """
+    return TableStore(lambda table, key: load_table(_conn, table, key), ttl=ttl,
+                      delta_loader=lambda table, column, watermark, key: load_rows_after(_conn, table, column,
+                                                                                         watermark, key),
+                      watermarks=dict(watermarks or ()),
+                      disk_cache=DiskTableCache(cache_dir) if cache_dir else None,
+                      keys=dict(keys or ()), order_by=order_by)
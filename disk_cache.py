@@ -0,0 +1,152 @@
+import datetime
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+
+def encode_watermark(value):
+    """
+    Returns a watermark as a JSON value tagged with its type, so decode_watermark restores
+    the type it had; a type JSON cannot carry is stored as None, which makes the next
+    refresh a full reload.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return {'type': 'timestamp', 'value': pd.Timestamp(value).isoformat()}
+    if hasattr(value, 'item'):
+        value = value.item()
+    for name, kind in (('bool', bool), ('int', int), ('float', float), ('str', str)):
+        if isinstance(value, kind):
+            return {'type': name, 'value': value}
+    return None
+
+
+def decode_watermark(stored):
+    """Returns the watermark saved by encode_watermark; untagged values decode to None."""
+    if not isinstance(stored, dict):
+        return None
+    if stored.get('type') == 'timestamp':
+        return pd.Timestamp(stored['value'])
+    return stored.get('value')
+
+
+class DiskTableCache:
+    """
+    A persistent on-disk cache of loaded tables.
+
+    Each table is stored as an uncompressed Arrow IPC file next to a JSON metadata file
+    holding its version and high-water mark; the mark is saved with its type, so a
+    timestamp comes back as a timestamp. Files are reopened memory-mapped, so a
+    restarted or new worker process can serve a table before the backend answers.
+
+    Attributes
+    ----------
+    directory : str
+        The directory the cache files live in.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, table, suffix):
+        return os.path.join(self.directory, f"{table}{suffix}")
+
+    def metadata(self, table):
+        """Returns the stored metadata of table, or None if it is not cached."""
+        try:
+            with open(self._path(table, '.json')) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(metadata, dict):
+            return None
+        metadata['watermark'] = decode_watermark(metadata.get('watermark'))
+        return metadata
+
+    def read(self, table):
+        """
+        Reopens a cached table.
+
+        Returns
+        -------
+            tuple or None
+                (DataFrame, metadata dict), or None if the table is not cached or the files
+                are unreadable.
+        """
+        metadata = self.metadata(table)
+        if metadata is None:
+            return None
+        try:
+            with pa.memory_map(self._path(table, '.arrow'), 'r') as source:
+                arrow_table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        # numeric columns without nulls are wrapped around the mapped buffers without copying
+        return arrow_table.to_pandas(split_blocks=True), metadata
+
+    def write(self, table, df, version, watermark=None, memory_report=None):
+        """
+        Stores df as the cached copy of table; the files are replaced atomically.
+
+        memory_report, a compaction report (see compact_frame), is kept in the metadata
+        as a dict of columns, so the debug panel can still show it after a restart.
+        """
+        metadata = {
+            'table': table,
+            'version': version,
+            'watermark': encode_watermark(watermark),
+            'rows': len(df),
+            'columns': [str(c) for c in df.columns],
+            'saved_at': time.time(),
+            'memory_report': None if memory_report is None else memory_report.to_dict(),
+        }
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        with self._lock:
+            data_path = self._path(table, '.arrow')
+            with pa.OSFile(data_path + '.tmp', 'wb') as sink:
+                with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                    writer.write_table(arrow_table)
+            with open(self._path(table, '.json.tmp'), 'w') as f:
+                json.dump(metadata, f)
+            os.replace(data_path + '.tmp', data_path)
+            os.replace(self._path(table, '.json.tmp'), self._path(table, '.json'))
+
+    def write_async(self, table, df, version, watermark=None, memory_report=None):
+        """Stores df from a background thread so callers are not blocked on disk."""
+        thread = threading.Thread(target=self._write_quietly, args=(table, df, version, watermark, memory_report),
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def _write_quietly(self, table, df, version, watermark, memory_report):
+        try:
+            self.write(table, df, version, watermark, memory_report)
+        except (OSError, pa.ArrowException) as e:
+            # a failed write only costs the next cold start a backend fetch
+            print(f"Could not cache table {table} on disk: {e}")
+
+    def tables(self):
+        """Returns the names of the cached tables."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def invalidate(self, table):
+        """Removes the cached copy of table."""
+        # waits for a write of the table in progress, which would otherwise recreate the files
+        with self._lock:
+            for suffix in ('.arrow', '.json'):
+                try:
+                    os.remove(self._path(table, suffix))
+                except FileNotFoundError:
+                    pass
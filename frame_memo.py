@@ -0,0 +1,174 @@
+import itertools
+import threading
+import weakref
+
+_fingerprints = {}
+_derived = {}
+# fingerprint -> [source frame, number of live shared copies]
+_shares = {}
+_forget_hooks = []
+# kind -> extend(value, rows), see extends
+_extensions = {}
+# reentrant: _forget runs from weakref callbacks, which may fire while the lock is held
+_lock = threading.RLock()
+_next_fingerprint = itertools.count(1)
+
+
+def dataframe_fingerprint(df):
+    """
+    Returns a token identifying a dataframe object.
+
+    Filter engines, filtered results and every value memoized by derived are keyed by this
+    token. Row masks and positional orders are only valid for the frame they were computed
+    on, so a token is never reused, even after the frame is garbage collected. Copies made
+    by share_frame carry the token of their source.
+
+    Parameters
+    ----------
+        df : DataFrame
+            The dataframe to identify.
+
+    Returns
+    -------
+        tuple
+            A hashable fingerprint.
+    """
+    key = id(df)
+    with _lock:
+        entry = _fingerprints.get(key)
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        fingerprint = ('frame', next(_next_fingerprint))
+        _fingerprints[key] = (weakref.ref(df, lambda _, k=key, f=fingerprint: _forget(k, f)), fingerprint)
+    return fingerprint
+
+
+def share_frame(source):
+    """
+    Returns a shallow copy of source that shares its fingerprint and derived values.
+
+    Every caller of a shared frame gets a copy of its own, so adding, dropping or
+    overwriting columns, or assigning cells, never reaches another caller: the copy and
+    source reference the same columns, and with copy-on-write (always on from pandas 3)
+    the first write to a column through either one copies that column. Values derived
+    from a copy are built from source, so they describe the data as it was shared and
+    ignore in-place edits made to the copy.
+
+    source is kept alive for as long as any of its copies is.
+    """
+    fingerprint = dataframe_fingerprint(source)
+    copy = source.copy(deep=False)
+    key = id(copy)
+    with _lock:
+        share = _shares.setdefault(fingerprint, [source, 0])
+        share[1] += 1
+        _fingerprints[key] = (weakref.ref(copy, lambda _, k=key, f=fingerprint: _release(k, f)), fingerprint)
+    return copy
+
+
+def source_frame(df):
+    """Returns the frame df was copied from by share_frame, or df itself."""
+    with _lock:
+        entry = _fingerprints.get(id(df))
+        if entry is None or entry[0]() is not df:
+            return df
+        share = _shares.get(entry[1])
+    return share[0] if share is not None else df
+
+
+def derived(df, key, build):
+    """
+    Returns build(df), computed once per dataframe fingerprint and key.
+
+    For a copy made by share_frame, build is called with its source instead. The value is
+    dropped together with the fingerprint when the frame is garbage collected, so it must
+    not hold a reference to the frame itself.
+
+    Parameters
+    ----------
+        df : DataFrame
+            The dataframe the value is derived from.
+        key : hashable
+            Distinguishes the values derived from the same frame.
+        build : callable
+            Computes the value from a frame.
+
+    Returns
+    -------
+        object
+            The memoized value.
+    """
+    slot = (dataframe_fingerprint(df), key)
+    with _lock:
+        if slot in _derived:
+            return _derived[slot]
+    value = build(source_frame(df))
+    with _lock:
+        return _derived.setdefault(slot, value)
+
+
+def extends(kind):
+    """
+    Registers the decorated extend(value, rows) for derived values whose key starts with
+    kind; it returns the value derived from a frame with rows appended.
+    """
+    def register(extend):
+        _extensions[kind] = extend
+        return extend
+    return register
+
+
+def carry_derived(previous, current, rows):
+    """
+    Derives the values of current, a frame holding the rows of previous and rows, from the
+    values already derived from previous.
+
+    Only values of a kind registered with extends are carried over; they cost work in
+    proportion to rows instead of to current. Every other value is built from current
+    when it is first asked for.
+    """
+    with _lock:
+        entry = _fingerprints.get(id(previous))
+        if entry is None or entry[0]() is not previous:
+            return
+        carried = [(key, value) for (fingerprint, key), value in list(_derived.items())
+                   if fingerprint == entry[1] and isinstance(key, tuple) and key and key[0] in _extensions]
+    if not carried:
+        return
+    fingerprint = dataframe_fingerprint(current)
+    for key, value in carried:
+        extended = _extensions[key[0]](value, rows)
+        with _lock:
+            _derived.setdefault((fingerprint, key), extended)
+
+
+def on_forget(hook):
+    """Registers hook(fingerprint), called after a fingerprinted frame is garbage collected."""
+    _forget_hooks.append(hook)
+    return hook
+
+
+def _release(key, fingerprint):
+    """Unregisters a collected shared copy and lets go of its source after the last one."""
+    with _lock:
+        entry = _fingerprints.get(key)
+        if entry is not None and entry[1] == fingerprint and entry[0]() is None:
+            del _fingerprints[key]
+        share = _shares.get(fingerprint)
+        if share is not None:
+            share[1] -= 1
+            if share[1] <= 0:
+                # the source may be collected here, which forgets the fingerprint
+                del _shares[fingerprint]
+
+
+def _forget(key, fingerprint):
+    """Drops the token and the derived values of a collected dataframe, then runs the hooks."""
+    with _lock:
+        entry = _fingerprints.get(key)
+        if entry is not None and entry[1] == fingerprint:
+            del _fingerprints[key]
+        for slot in [s for s in list(_derived) if s[0] == fingerprint]:
+            del _derived[slot]
+    for hook in _forget_hooks:
+        hook(fingerprint)
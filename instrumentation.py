@@ -0,0 +1,168 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import streamlit as st
+
+
+logger = logging.getLogger("rewinding.profile")
+
+
+class Profiler:
+    """
+    Opt-in timing of the dashboard's hot paths.
+
+    Every stage timing is added to process-wide totals and to the record of the current
+    script run of the calling thread, so a session's debug panel shows its own rerun while
+    background threads (prefetching, revalidation) only feed the totals. When disabled,
+    stage() returns a shared no-op context manager.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether stages are timed.
+    totals : dict
+        Stage names mapped to {'calls', 'seconds', 'max_seconds'} since start-up.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.totals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._noop = nullcontext()
+
+    def begin_run(self):
+        """Starts a new run record for the calling thread."""
+        self._local.records = []
+        self._local.started = time.perf_counter()
+
+    def run_records(self):
+        """Returns the (stage, seconds) records of the calling thread's current run."""
+        return list(getattr(self._local, 'records', []))
+
+    def stage(self, name):
+        """Returns a context manager timing the enclosed block as stage name."""
+        if not self.enabled:
+            return self._noop
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        """Adds one timing of stage name."""
+        records = getattr(self._local, 'records', None)
+        if records is not None:
+            records.append((name, seconds))
+        with self._lock:
+            total = self.totals.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            total['calls'] += 1
+            total['seconds'] += seconds
+            total['max_seconds'] = max(total['max_seconds'], seconds)
+
+    def run_summary(self):
+        """
+        Summarizes the current run by stage.
+
+        Returns
+        -------
+            DataFrame
+                Indexed by stage, with 'calls', 'seconds' and 'share' of the run's wall time.
+        """
+        import pandas as pd  # only needed with profiling on; the entry script imports this module on every page
+        records = pd.DataFrame(self.run_records(), columns=['stage', 'seconds'])
+        summary = records.groupby('stage')['seconds'].agg(calls='count', seconds='sum')
+        wall = time.perf_counter() - getattr(self._local, 'started', time.perf_counter())
+        summary['share'] = summary['seconds'] / wall if wall > 0 else float('nan')
+        return summary.sort_values('seconds', ascending=False)
+
+    def export(self, caches=None, memory=None, path=None):
+        """
+        Emits the current run as one structured record.
+
+        The record is logged as JSON on the 'rewinding.profile' logger and, if path is
+        given, appended to that file as a JSON line.
+        """
+        record = {
+            'time': time.time(),
+            'stages': [{'stage': name, 'seconds': seconds} for name, seconds in self.run_records()],
+            'caches': caches or {},
+            'memory_bytes': memory or {},
+        }
+        line = json.dumps(record, default=str)
+        logger.info(line)
+        if path:
+            with self._lock, open(path, 'a') as f:
+                f.write(line + '\n')
+        return record
+
+
+profiler = Profiler()
+
+
+def cache_stats(**caches):
+    """
+    Returns the hit rates of caches that count hits and misses.
+
+    Parameters
+    ----------
+        **caches
+            Names mapped to objects with 'hits' and 'misses' attributes.
+
+    Returns
+    -------
+        dict
+            Names mapped to {'hits', 'misses', 'hit_rate'}.
+    """
+    stats = {}
+    for name, cache in caches.items():
+        hits, misses = cache.hits, cache.misses
+        stats[name] = {'hits': hits, 'misses': misses,
+                       'hit_rate': hits / (hits + misses) if hits + misses else None}
+    return stats
+
+
+def frame_memory(**frames):
+    """Returns the deep memory usage in bytes of named dataframes."""
+    return {name: int(df.memory_usage(index=True, deep=True).sum()) for name, df in frames.items() if df is not None}
+
+
+def render_panel(caches=None, memory=None, reports=None):
+    """
+    Draws the collapsible debug panel of the current run.
+
+    Parameters
+    ----------
+        caches : dict, optional
+            Cache statistics, as returned by cache_stats.
+        memory : dict, optional
+            Dataframe memory in bytes, as returned by frame_memory.
+        reports : dict, optional
+            Table names mapped to their compaction reports (see compact_frame).
+    """
+    import pandas as pd
+    with st.expander("Performance (debug)", expanded=False):
+        summary = profiler.run_summary()
+        st.markdown("**Stages this rerun**")
+        st.dataframe(summary)
+        st.markdown("**Stages since start-up**")
+        st.dataframe(pd.DataFrame.from_dict(profiler.totals, orient='index'))
+        if caches:
+            st.markdown("**Caches**")
+            st.dataframe(pd.DataFrame.from_dict(caches, orient='index'))
+        if memory:
+            st.markdown("**Dataframe memory (MB)**")
+            st.dataframe(pd.Series(memory, name='MB') / 1024 ** 2)
+        if reports:
+            st.markdown("**Table compaction (MB)**")
+            report = pd.concat(reports, names=['table', 'column'])
+            report[['bytes_before', 'bytes_after']] = report[['bytes_before', 'bytes_after']] / 1024 ** 2
+            st.dataframe(report.rename(columns={'bytes_before': 'MB_before', 'bytes_after': 'MB_after'}))
@@ -0,0 +1,210 @@
+import csv
+import os
+import re
+
+import pandas as pd
+from streamlit.connections import BaseConnection
+
+
+class LocalResponse:
+    """A query response holding its rows in .data, like the Supabase client's."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class LocalQuery:
+    """
+    An in-memory stand-in for a Supabase select request builder.
+
+    Supports the subset of the builder API the dashboard uses: eq, neq, in_, gt, gte,
+    lt, lte, filter, order, limit, range and execute, and aggregate select items such as
+    'rows:count()' or 'mean:"Duration (Seconds)".avg()', grouped by the plain columns
+    selected next to them. Builders are chainable and, unlike the real ones, never
+    mutate a shared builder.
+    """
+
+    _OPERATORS = {
+        'eq': lambda s, v: s == v,
+        'neq': lambda s, v: s != v,
+        'gt': lambda s, v: s > v,
+        'gte': lambda s, v: s >= v,
+        'lt': lambda s, v: s < v,
+        'lte': lambda s, v: s <= v,
+        'in': lambda s, v: s.isin(list(v)),
+    }
+
+    _AGGREGATES = {'count': 'count', 'sum': 'sum', 'avg': 'mean', 'min': 'min', 'max': 'max'}
+
+    def __init__(self, client, table, columns, predicates=(), order=(), offset=0, limit=None, aggregates=()):
+        self._client = client
+        self._table = table
+        self._columns = columns
+        self._aggregates = aggregates
+        self._predicates = predicates
+        self._order = order
+        self._offset = offset
+        self._limit = limit
+
+    def _with(self, **changes):
+        state = dict(predicates=self._predicates, order=self._order, offset=self._offset, limit=self._limit)
+        state.update(changes)
+        return LocalQuery(self._client, self._table, self._columns, aggregates=self._aggregates, **state)
+
+    def filter(self, column, operator, criteria):
+        return self._with(predicates=self._predicates + ((_unquote(column), operator, criteria),))
+
+    def eq(self, column, value):
+        return self.filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self.filter(column, 'neq', value)
+
+    def in_(self, column, values):
+        return self.filter(column, 'in', tuple(values))
+
+    def gt(self, column, value):
+        return self.filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self.filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self.filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self.filter(column, 'lte', value)
+
+    def order(self, column, desc=False, **kwargs):
+        return self._with(order=self._order + ((_unquote(column), not desc),))
+
+    def limit(self, size, **kwargs):
+        return self._with(limit=size)
+
+    def range(self, start, end, **kwargs):
+        return self._with(offset=start, limit=end - start + 1)
+
+    def execute(self):
+        df = self._client.table_frame(self._table)
+        for column, operator, value in self._predicates:
+            if operator not in self._OPERATORS:
+                raise ValueError(f"Operator '{operator}' is not supported by the local connection.")
+            df = df[self._OPERATORS[operator](df[column], value)]
+        if self._aggregates:
+            df = self._aggregate(df)
+        elif self._columns:
+            df = df[self._columns]
+        if self._order:
+            df = df.sort_values([c for c, _ in self._order], ascending=[a for _, a in self._order], kind='stable')
+        stop = None if self._limit is None else self._offset + self._limit
+        df = df.iloc[self._offset:stop]
+        return LocalResponse(df.astype(object).where(df.notna(), None).to_dict('records'))
+
+
+    def _aggregate(self, df):
+        """Computes the aggregate select items, grouped by the selected plain columns."""
+        groups = list(self._columns or [])
+        if not groups:
+            row = {}
+            for alias, function, column in self._aggregates:
+                row[alias] = len(df) if column is None else getattr(df[column], self._AGGREGATES[function])()
+            return pd.DataFrame([row])
+        grouped = df.groupby(groups, dropna=False, sort=False, observed=True)
+        result = {}
+        for alias, function, column in self._aggregates:
+            result[alias] = grouped.size() if column is None else grouped[column].agg(self._AGGREGATES[function])
+        return pd.DataFrame(result).reset_index()
+
+
+class LocalTable:
+    """The entry point of client.table(name), offering select."""
+
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+
+    def select(self, *columns, count=None):
+        names = []
+        aggregates = []
+        for spec in columns:
+            for item in _split_select(spec):
+                match = _AGGREGATE_ITEM.match(item)
+                if match:
+                    column = match.group('column')
+                    aggregates.append((match.group('alias') or match.group('function'), match.group('function'),
+                                       _unquote(column) if column else None))
+                else:
+                    names.append(item)
+        return LocalQuery(self._client, self._table, None if names in ([], ['*']) else names,
+                          aggregates=tuple(aggregates))
+
+
+class LocalClient:
+    """
+    Serves tables from files in a directory.
+
+    A table named T is read from T.parquet, T.arrow or T.csv, whichever exists first, and
+    kept in memory after the first read.
+    """
+
+    EXTENSIONS = ('.parquet', '.arrow', '.csv')
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._frames = {}
+
+    def table(self, name):
+        return LocalTable(self, name)
+
+    def table_frame(self, name):
+        """Returns the full contents of table name as a DataFrame."""
+        if name not in self._frames:
+            self._frames[name] = self._read(name)
+        return self._frames[name]
+
+    def _read(self, name):
+        for extension in self.EXTENSIONS:
+            path = os.path.join(self.directory, name + extension)
+            if not os.path.exists(path):
+                continue
+            if extension == '.parquet':
+                return pd.read_parquet(path)
+            if extension == '.arrow':
+                return pd.read_feather(path)
+            return pd.read_csv(path)
+        raise FileNotFoundError(f"No file for table '{name}' in {self.directory}.")
+
+
+class LocalSupabaseConnection(BaseConnection):
+    """
+    A file-backed stand-in for SupabaseConnection, for running the dashboard offline.
+
+    Create it with st.connection("local", type=LocalSupabaseConnection, directory=...);
+    query() and client.table() answer from the files in that directory.
+    """
+
+    def _connect(self, directory=None, **kwargs):
+        directory = directory or self._secrets.get('directory')
+        if not directory:
+            raise ValueError("LocalSupabaseConnection needs a data directory.")
+        return LocalClient(directory)
+
+    @property
+    def client(self):
+        return self._instance
+
+    def query(self, *columns, table, count=None, ttl=None):
+        """Starts a select on table, mirroring SupabaseConnection.query."""
+        return self.client.table(table).select(*columns, count=count)
+
+
+_AGGREGATE_ITEM = re.compile(r'^(?:(?P<alias>\w+):)?(?:(?P<column>"[^"]*"|\w+)\.)?(?P<function>count|sum|avg|min|max)\(\)$')
+
+
+def _unquote(name):
+    return name[1:-1] if len(name) >= 2 and name[0] == name[-1] == '"' else name
+
+
+def _split_select(spec):
+    """Splits a PostgREST select list into column names, honouring quoted names."""
+    return [name.strip() for name in next(csv.reader([spec], quotechar='"', skipinitialspace=True)) if name.strip()]
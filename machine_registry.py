@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+from frame_memo import derived
+
+
+class MachineRegistry:
+    """
+    The rewinding machines known to the app and the tables holding their event logs.
+
+    Attributes
+    ----------
+    machines : list
+        Machine identifiers, sorted.
+    table_pattern : str
+        Format string turning a machine identifier into its table name.
+    """
+
+    def __init__(self, machines, table_pattern='{machine}_Data'):
+        self.machines = sorted(machines)
+        self.table_pattern = table_pattern
+
+    @classmethod
+    def discover(cls, store, source_table='all_variants', column='machine', fallback=(), **kwargs):
+        """
+        Builds the registry from the distinct machines listed in source_table.
+
+        The machines are read from the table's snapshot in store, which the Variants page
+        and the prefetcher use as well, so discovery adds no backend query of its own. It
+        never waits on the backend either (see TableStore.peek): until the table has been
+        loaded, or if it lists no machines, fallback is used instead. The distinct machines
+        are derived once per table version.
+        """
+        try:
+            snapshot = store.peek(source_table)
+            machines = set() if snapshot is None else derived(snapshot.df, ('distinct', column),
+                                                              lambda df: _distinct(df, column))
+        except Exception as e:
+            print(f"Machine discovery failed: {e}")
+            machines = set()
+        return cls(machines or fallback, **kwargs)
+
+    @classmethod
+    def discover_distinct(cls, source, column='machine', fallback=(), **kwargs):
+        """
+        Builds the registry from the distinct machines of a PushdownSource.
+
+        The database groups the column and returns one row per machine, so no rows of the
+        source table are transferred. If the query fails or returns nothing, fallback is
+        used instead.
+        """
+        try:
+            machines = {m for m in source.distinct(column, {}) if m}
+        except Exception as e:
+            print(f"Machine discovery failed: {e}")
+            machines = set()
+        return cls(machines or fallback, **kwargs)
+
+    def table_for(self, machine):
+        """Returns the event table of machine, or None for an unknown machine."""
+        if machine not in self.machines:
+            return None
+        return self.table_pattern.format(machine=machine)
+
+    def table_map(self):
+        """Returns every machine mapped to its event table."""
+        return {machine: self.table_for(machine) for machine in self.machines}
+
+
+class PartitionedEventLog:
+    """
+    A fleet-wide view over the per-machine event tables.
+
+    The view is partitioned by machine (one table per machine, loaded lazily through the
+    TableStore) and by week (row positions per week, indexed once per table snapshot). A
+    query only loads the machine tables and reads the week partitions that its selection
+    can match; the remaining selections are applied to those rows alone.
+
+    Attributes
+    ----------
+    registry : MachineRegistry
+        The machines and their tables.
+    store : TableStore
+        The store the machine tables are loaded from.
+    week_column : str
+        The column the tables are partitioned by within a machine.
+    """
+
+    def __init__(self, registry, store, week_column='week_number'):
+        self.registry = registry
+        self.store = store
+        self.week_column = week_column
+
+    def prune(self, selections):
+        """Returns the machines a selection can match."""
+        machines = selections.get('machine') or self.registry.machines
+        return [m for m in machines if self.registry.table_for(m) is not None]
+
+    def _machine_rows(self, machine, selections, columns):
+        snapshot = self.store.snapshot(self.registry.table_for(machine))
+        df = snapshot.df
+        weeks = selections.get(self.week_column)
+        if weeks and self.week_column in df.columns:
+            index = snapshot.partition_index(self.week_column)
+            parts = [index[w] for w in weeks if w in index]
+            positions = np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.intp)
+            df = df.iloc[positions]
+        for column, values in selections.items():
+            if values and column not in ('machine', self.week_column) and column in df.columns:
+                df = df[df[column].isin(values)]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        if 'machine' not in df.columns:
+            df = df.assign(machine=machine)
+        return df
+
+    def scan(self, selections, columns=None):
+        """
+        Returns the matching event rows of every machine the selection needs.
+
+        Parameters
+        ----------
+            selections : dict
+                Column names mapped to selected values, as kept by DynamicFilters; empty
+                lists select everything.
+            columns : list, optional
+                Columns to return besides 'machine'.
+
+        Returns
+        -------
+            DataFrame
+                The rows, with a 'machine' column.
+        """
+        frames = [self._machine_rows(m, selections, columns) for m in self.prune(selections)]
+        if not frames:
+            return pd.DataFrame(columns=(columns or []) + ['machine'])
+        return pd.concat(frames, ignore_index=True)
+
+    def compare(self, selections, duration_column='Duration (Seconds)', count_column='Case ID'):
+        """
+        Compares machines under a selection.
+
+        Every compared machine's event table is loaded, so the machines must be selected
+        explicitly; an empty machine selection does not mean the whole fleet here.
+
+        Returns
+        -------
+            DataFrame
+                Indexed by machine, with 'cycles', 'mean_duration' and 'p95_duration' (in
+                seconds) for every selected machine.
+
+        Raises
+        ------
+            ValueError
+                If no machine is selected.
+        """
+        if not selections.get('machine'):
+            raise ValueError("Select the machines to compare.")
+        rows = []
+        for machine in self.prune(selections):
+            df = self._machine_rows(machine, selections, [duration_column, count_column])
+            durations = df[duration_column] if duration_column in df.columns else pd.Series(dtype=float)
+            rows.append({
+                'machine': machine,
+                'cycles': int(df[count_column].nunique()) if count_column in df.columns else len(df),
+                'mean_duration': durations.mean(),
+                'p95_duration': durations.quantile(0.95),
+            })
+        return pd.DataFrame(rows, columns=['machine', 'cycles', 'mean_duration', 'p95_duration']).set_index('machine')
+
+
+def _distinct(df, column):
+    """Returns the distinct non-empty values of column in df."""
+    return frozenset(m for m in df[column].dropna().unique() if m) if column in df.columns else frozenset()
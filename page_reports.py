@@ -0,0 +1,7 @@
+import streamlit as st
+from streamlit_file_browser import st_file_browser
+
+
+def render(selected, page_frames):
+    st.title(f":grey[{selected}]")
+    event = st_file_browser("reports")
@@ -0,0 +1,151 @@
+import pandas as pd
+import streamlit as st
+
+from custom_dynamic_filters import DynamicFilters
+from process_mining import annotate_events
+from analytics import kpi_cube, scan_kpis, step_duration_histograms, step_histogram_figure
+from process_maps import create_combined_diagram, prewarm_frame, show_process_map, variant_weights
+from instrumentation import profiler
+from resources import (DETAIL_PAGE_SIZE, FILTER_APPLY_MODE, MAX_COMPARE_MACHINES, STEPS_KPI_DIMENSIONS, TABLE_ORDER,
+                       fetch_data, get_fleet, get_registry, schedule_prefetch)
+
+
+def render(selected, page_frames):
+    # Map machine filter value to Supabase table names
+    table_map = get_registry().table_map()
+
+    st.title(f":grey[{selected} Analysis]")
+
+    # Define the machine options for the selector
+    machine_options = list(table_map)
+
+    # Use st.selectbox to let the user choose a machine.
+    # Set "M001" as the default option by specifying index=0, since "M001" is the first item in the list.
+    selected_machine = st.selectbox("Select a machine:", machine_options, index=0)
+
+    table_name = table_map.get(selected_machine)
+    #print(table_name)
+
+    if table_name:
+        df = fetch_data(table_name, sort_by=TABLE_ORDER)
+        if not df.empty and 'Variant Rank' not in df.columns:
+            # Tables without precomputed variants (new machines) are mined from their raw events
+            df = annotate_events(df)
+        page_frames['table'] = df
+        prewarm_frame(df, n=3)
+    else:
+        st.error("Invalid machine selection.")
+        df = pd.DataFrame()
+
+    if df.empty:
+        st.write("No data available for the selected machine.")
+    else:
+        #print(df)
+        # Display the dynamic filters
+        dynamic_filters2 = DynamicFilters(df, filters=['Variant Rank','concept:name'], identifier='set2')
+        #dynamic_filters2.set_default_values({'Variant Rank': "1"})
+        #print(dynamic_filters2)
+
+        dynamic_filters2.display_filters(location='columns', num_columns=2, gap='large', apply_mode=FILTER_APPLY_MODE)
+
+        variant_filter_value = dynamic_filters2.get_filter_value('Variant Rank')[0] if dynamic_filters2.get_filter_value(
+            'Variant Rank') else None
+
+        # Here we add KPIs and visualization code
+        filtered_df = dynamic_filters2.filter_df()
+        page_frames['filtered'] = filtered_df
+        cube = kpi_cube(df, STEPS_KPI_DIMENSIONS)
+        selection = dynamic_filters2.get_filter_values()
+        kpis = cube.query(selection) if cube.covers(selection) else scan_kpis(filtered_df)
+        kpis_all = cube.query({})
+        avg_duration = kpis['mean'] / 60
+        avg_duration_all = kpis_all['mean'] / 60
+        filtered_count = kpis['cycles']
+        all_count = kpis_all['cycles']
+
+        # Creating KPIs
+        kpi1, kpi2, kpi3 = st.columns(3)
+        # logs without durations (no duration or timestamp column) have no average
+        kpi1.metric(label="Average Duration (Min)", value="n/a" if pd.isna(avg_duration) else f"{avg_duration:.2f}")
+        kpi2.metric(label="Filtered Cycles Count", value=f"{filtered_count}")
+        kpi3.metric(label="Total Cycles Count", value=f"{all_count}")
+
+
+        # Example histogram for cycle durations
+        fig_col1, fig_col2 = st.columns(2)
+        with fig_col1:
+
+            variant_rank_filter_values = dynamic_filters2.get_filter_value('Variant Rank') if dynamic_filters2.get_filter_value('Variant Rank') else None
+            combine_maps = st.checkbox("Combine process maps", value=False,
+                                       help="Draw the shown variants as one directly-follows graph weighted by cycles")
+            if combine_maps:
+                shown_ranks = variant_rank_filter_values or filtered_df['Variant Rank'].unique()[:3]
+                st.markdown("<h6>Combined Process Map</h6>", unsafe_allow_html=True)
+                st.graphviz_chart(create_combined_diagram(variant_weights(filtered_df, list(shown_ranks))).source)
+            elif variant_rank_filter_values:
+                for i,variant_rank in enumerate(variant_rank_filter_values):
+                    st.markdown(f"<h6>Process Map {variant_rank} </h6>", unsafe_allow_html=True)
+                    # st.markdown("Process Map")
+                    # print(dynamic_filters.filter_df()['Variant'])
+                    filtered_variant_text = str(filtered_df[filtered_df['Variant Rank'] == variant_rank]['Variant'].iloc[0])
+                    print(filtered_variant_text)
+                    # st.header(f'Variant Rank 1 Flow Diagram for {machine_filter_value}')
+                    show_process_map(filtered_variant_text)
+            else:
+                count_filtered_variants = filtered_df['Variant Rank'].unique().shape[0]
+                if count_filtered_variants >= 3:
+                    variant_rank_show_graph = filtered_df['Variant Rank'].unique()[:3]
+                else:
+                    variant_rank_show_graph = filtered_df['Variant Rank'].unique()
+                    print(variant_rank_show_graph)
+
+                for variant_rank in variant_rank_show_graph:  # Corrected iteration here
+                    st.markdown(f"<h6>Process Map {variant_rank} </h6>", unsafe_allow_html=True)
+                    # Make sure to filter the DataFrame safely
+                    filtered_variant_df = filtered_df[filtered_df['Variant Rank'] == variant_rank]
+                    if not filtered_variant_df.empty:
+                        filtered_variant_text = str(filtered_variant_df['Variant'].iloc[0])
+                        # Here you can include your logic for creating and displaying the diagram
+                        show_process_map(filtered_variant_text)
+                    else:
+                        st.markdown(f"<h6>No data available for Variant Rank {variant_rank}.</h6>",
+                                    unsafe_allow_html=True)
+
+        with fig_col2:
+
+            step_filter_values = dynamic_filters2.get_filter_value('concept:name') if dynamic_filters2.get_filter_value('concept:name') else None
+
+            if not filtered_df.empty:
+
+                # One binned pass over all steps, drawn as a single faceted figure
+                with profiler.stage('plotly_figure'):
+                    step_bins, step_stats = step_duration_histograms(filtered_df, nbins=20)
+                    fig = step_histogram_figure(step_bins, step_stats) if len(step_stats) else None
+                if fig is not None:
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.write("No step durations available for the selection.")
+
+        # Display detailed data view
+        st.markdown("### Detailed Data View")
+        dynamic_filters2.display_df(page_size=DETAIL_PAGE_SIZE)
+
+        # Compare machines on the current step and variant selection
+        if st.checkbox("Compare machines", value=False):
+            compare_machines = st.multiselect("Machines to compare", machine_options,
+                                              default=[selected_machine], key="fleet_machines",
+                                              max_selections=MAX_COMPARE_MACHINES)
+            if not compare_machines:
+                # every compared machine loads its whole table, so none selected means none compared
+                st.info("Select the machines to compare.")
+            else:
+                fleet_selection = dynamic_filters2.get_filter_values()
+                fleet_selection['machine'] = compare_machines
+                comparison = get_fleet().compare(fleet_selection)
+                st.dataframe(pd.DataFrame({
+                    'Cycles': comparison['cycles'],
+                    'Average Duration (Min)': comparison['mean_duration'] / 60,
+                    'P95 Duration (Min)': comparison['p95_duration'] / 60,
+                }))
+
+    schedule_prefetch()
@@ -0,0 +1,106 @@
+import streamlit as st
+
+from custom_dynamic_filters import DynamicFilters
+from supabase_pushdown import PushdownSource
+from analytics import duration_histogram, histogram_figure, kpi_cube, scan_kpis
+from process_maps import prewarm_frame, show_process_map
+from instrumentation import profiler
+from resources import (ALL_VARIANTS_KEY, DETAIL_PAGE_SIZE, FILTER_APPLY_MODE, PUSHDOWN, TABLE_ORDER,
+                       VARIANTS_KPI_DIMENSIONS, fetch_data, get_connection, schedule_prefetch)
+
+
+# Maximum number of cycle durations drawn as rug marks under the Variants histogram
+HISTOGRAM_SAMPLE_POINTS = 500
+
+# Columns of all_variants the page reads or shows; pushdown mode fetches only these
+VARIANTS_COLUMNS = ['Case ID', 'machine', 'week_number', 'Variant Rank', 'Variant', 'Duration (Seconds)']
+
+
+def render(selected, page_frames):
+    st.title(f":grey[{selected} Analysis]")
+
+    if PUSHDOWN:
+        # ranks repeat, so the key breaks ties and keeps the pages of a result consistent
+        source = PushdownSource(get_connection(), "all_variants", columns=VARIANTS_COLUMNS,
+                                order_by=('Variant Rank', *ALL_VARIANTS_KEY))
+        dynamic_filters = DynamicFilters(None, filters=['machine', 'Variant Rank', 'week_number'], identifier='set1',
+                                         source=source)
+    else:
+        df = fetch_data("all_variants", sort_by=TABLE_ORDER)
+        page_frames['table'] = df
+        prewarm_frame(df, n=3)
+        #print(df)
+        #print(df.head())
+
+        dynamic_filters = DynamicFilters(df, filters=['machine', 'Variant Rank', 'week_number'], identifier='set1')
+    dynamic_filters.set_default_values({'machine': "M001"})
+    dynamic_filters.display_filters(location='columns', num_columns=3, gap='large', apply_mode=FILTER_APPLY_MODE)
+    #dynamic_filters.set_default_values({'Variant Rank': "1"})
+
+
+    machine_filter_value = dynamic_filters.get_filter_value('machine')[0] if dynamic_filters.get_filter_value('machine') else None
+    variant_filter_value = dynamic_filters.get_filter_value('Variant Rank')[0] if dynamic_filters.get_filter_value('Variant Rank') else None
+
+    image_placeholder = st.empty()
+
+    if machine_filter_value and variant_filter_value:
+        #image_filename = f'data/{machine_filter_value}__{variant_filter_value}.png'
+
+        kpi1, kpi2, kpi3 = st.columns(3)
+
+        if PUSHDOWN:
+            # counts and means are aggregated by the database, so no rows are transferred for them
+            totals = source.totals(dynamic_filters.get_filter_values())
+            totals_all = source.totals({})
+            avg_duration = totals['mean']/60
+            avg_duration_all = totals_all['mean']/60
+
+            filtered_count = totals['cycles']
+            all_count = totals_all['cycles']
+        else:
+            # KPIs are rolled up from a cube built once per loaded table; week selections,
+            # which the cube leaves out, are answered from the filtered rows
+            cube = kpi_cube(df, VARIANTS_KPI_DIMENSIONS)
+            selection = dynamic_filters.get_filter_values()
+            kpis = cube.query(selection) if cube.covers(selection) else scan_kpis(dynamic_filters.filter_df())
+            kpis_all = cube.query({})
+            avg_duration = kpis['mean']/60
+            avg_duration_all = kpis_all['mean']/60
+
+            filtered_count = kpis['cycles']
+            all_count = kpis_all['cycles']
+            kpi3.metric(label="P95 Duration (Min) ", value=round(kpis['p95']/60,1), delta=round(kpis_all['p95']/60,1))
+
+        kpi1.metric(label="Duration (Min) ", value=round(avg_duration,1), delta= round(avg_duration_all,1))
+        kpi2.metric(label="Cycles ", value= round(filtered_count), delta=round(all_count))
+
+        fig_col1, fig_col0, fig_col2 = st.columns([3,1.5,2])
+        with fig_col1:
+            df_filtered = dynamic_filters.filter_df()
+            page_frames['filtered'] = df_filtered
+            with profiler.stage('plotly_figure'):
+                # Bins are computed here and the rug shows a capped sample, so the figure
+                # stays the same size however many cycles are selected
+                duration_bins, duration_sample = duration_histogram(df_filtered['Duration (Seconds)'], nbins=20,
+                                                                    max_points=HISTOGRAM_SAMPLE_POINTS)
+                fig2 = histogram_figure(duration_bins, duration_sample, title="Cycle Duration Histogram")
+                fig2.update_layout(dragmode='pan')
+            st.write(fig2)
+
+
+        with fig_col2:
+
+            st.markdown("<h6>Process Map</h6>", unsafe_allow_html=True)
+
+            #st.markdown("Process Map")
+            #print(dynamic_filters.filter_df()['Variant'])
+            filtered_variant = str(dynamic_filters.filter_df()['Variant'].iloc[0])
+            #st.header(f'Variant Rank 1 Flow Diagram for {machine_filter_value}')
+            show_process_map(filtered_variant)
+            #st.image(image_filename)
+
+
+        st.markdown("### Detailed Data View")
+        dynamic_filters.display_df(page_size=DETAIL_PAGE_SIZE)
+
+    schedule_prefetch()
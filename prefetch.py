@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+
+class Prefetcher:
+    """
+    Loads tables into a TableStore in the background.
+
+    Tables are fetched concurrently on a bounded thread pool, and failed loads are retried
+    with exponential backoff. Scheduling a table that is still fresh in the store or already
+    queued is a no-op, so schedule can be called on every rerun.
+
+    Attributes
+    ----------
+    store : TableStore
+        The store the loaded tables go into.
+    retries : int
+        Number of extra attempts after a failed load.
+    backoff : float
+        Seconds to wait before the first retry; doubled for every further retry.
+    """
+
+    def __init__(self, store, max_workers=4, retries=2, backoff=0.5):
+        self.store = store
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, tables):
+        """
+        Queues every table that is neither fresh nor already queued.
+
+        Returns
+        -------
+            dict
+                Table names mapped to the futures of their pending loads.
+        """
+        submitted = []
+        with self._lock:
+            for table in tables:
+                if table in self._pending or self.store.is_fresh(table):
+                    continue
+                future = self._executor.submit(self._load, table)
+                self._pending[table] = future
+                submitted.append((table, future))
+            pending = dict(self._pending)
+        # registered outside the lock: a load that has already finished runs _done inline,
+        # and _done takes the lock
+        for table, future in submitted:
+            future.add_done_callback(lambda f, t=table: self._done(t, f))
+        return pending
+
+    def _done(self, table, future):
+        with self._lock:
+            # a later schedule may have queued the table again already
+            if self._pending.get(table) is future:
+                del self._pending[table]
+
+    def _load(self, table):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.store.snapshot(table)
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Prefetching table {table} failed: {e}")
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher(_store, max_workers=4):
+    """Returns the process-wide Prefetcher of a TableStore."""
+    return Prefetcher(_store, max_workers=max_workers)
@@ -0,0 +1,180 @@
+import threading
+from collections import Counter, OrderedDict
+
+import streamlit as st
+from graphviz import Digraph, ExecutableNotFound
+
+from compaction import step_codec
+from frame_memo import derived
+from instrumentation import profiler
+
+
+# Function to create a flow diagram for a given variant
+def create_variant_diagram(variant_text):
+    steps = variant_text.split(',')
+    dot = Digraph()
+    for i, step in enumerate(steps):
+        dot.node(str(i), step)
+        if i > 0:
+            dot.edge(str(i-1), str(i))
+    return dot
+
+
+def create_combined_diagram(variant_weights):
+    """
+    Builds one directly-follows graph for several variants.
+
+    Each distinct step becomes one node and each pair of consecutive steps one edge, whose
+    label and pen width reflect the summed weight of the variants that contain it. Nodes
+    are identified by their position and show the step name as their label, so names
+    with characters Graphviz reads in node IDs, such as ':', are drawn as they are.
+
+    Parameters
+    ----------
+    variant_weights : dict
+        Comma-joined variant strings mapped to their frequency (e.g. number of cycles).
+
+    Returns
+    -------
+    Digraph
+        The combined process map.
+    """
+    nodes = Counter()
+    edges = Counter()
+    for variant_text, weight in variant_weights.items():
+        steps = step_codec.decode(step_codec.encode(variant_text))
+        for step in steps:
+            nodes[step] += weight
+        for source, target in zip(steps, steps[1:]):
+            edges[(source, target)] += weight
+    heaviest = max(edges.values(), default=1) or 1
+    node_ids = {step: str(i) for i, step in enumerate(nodes)}
+    dot = Digraph()
+    for step, weight in nodes.items():
+        dot.node(node_ids[step], f"{step}\n({weight:g})")
+    for (source, target), weight in edges.items():
+        dot.edge(node_ids[source], node_ids[target], label=f"{weight:g}",
+                 penwidth=f"{1 + 4 * weight / heaviest:.2f}")
+    return dot
+
+
+class ProcessMapCache:
+    """
+    An LRU cache of rendered variant process maps.
+
+    Entries are keyed by the interned step sequence of a variant and hold its DOT source
+    and, when the Graphviz executable is available, the pre-rendered SVG.
+
+    Attributes
+    ----------
+    max_entries : int
+        Maximum number of cached process maps.
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of process maps that had to be built.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._svg_available = True
+
+    def get(self, variant_text):
+        """
+        Returns the (dot_source, svg) pair of a variant, building it on a miss.
+
+        svg is None when Graphviz cannot render on this machine.
+        """
+        key = self._key(variant_text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        with profiler.stage('graphviz_render'):
+            entry = self._render(create_variant_diagram(variant_text))
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _key(variant_text):
+        return tuple(step_codec.encode(variant_text).tolist())
+
+    def _render(self, diagram):
+        source = diagram.source
+        svg = None
+        if self._svg_available:
+            try:
+                svg = diagram.pipe(format='svg').decode('utf-8')
+            except ExecutableNotFound:
+                # no dot binary: fall back to client-side rendering of the DOT source
+                self._svg_available = False
+        return source, svg
+
+    def prewarm(self, variant_texts):
+        """Renders the not yet cached variants among variant_texts in a background thread."""
+        with self._lock:
+            missing = [v for v in variant_texts if self._key(v) not in self._entries]
+        if not missing:
+            return None
+        thread = threading.Thread(target=lambda: [self.get(v) for v in missing], daemon=True)
+        thread.start()
+        return thread
+
+    def __len__(self):
+        return len(self._entries)
+
+
+process_map_cache = ProcessMapCache()
+
+
+def top_variants(df, n=3):
+    """Returns the Variant strings of the n best-ranked variants in df."""
+    if df.empty or 'Variant Rank' not in df.columns or 'Variant' not in df.columns:
+        return []
+    ranked = df[['Variant Rank', 'Variant']].drop_duplicates('Variant Rank').sort_values('Variant Rank')
+    return [str(v) for v in ranked['Variant'].head(n)]
+
+
+def prewarm_frame(df, n=3, cache=process_map_cache):
+    """
+    Pre-renders the process maps of the n best-ranked variants of a freshly loaded table.
+
+    The best-ranked variants are derived once per dataframe, so calling this on every
+    rerun with the same shared frame costs a lookup and a check of the map cache.
+    """
+    return cache.prewarm(derived(df, ('top_variants', n), lambda d: top_variants(d, n)))
+
+
+def variant_weights(df, variant_ranks=None):
+    """
+    Returns Variant strings mapped to their frequency, optionally for some ranks only.
+
+    The frequency is the number of distinct cases when df has a 'Case ID' column, and the
+    number of rows otherwise.
+    """
+    if variant_ranks is not None:
+        df = df[df['Variant Rank'].isin(variant_ranks)]
+    if 'Case ID' in df.columns:
+        counts = df.groupby('Variant', observed=True, sort=False)['Case ID'].nunique()
+    else:
+        counts = df['Variant'].value_counts(sort=False)
+    return {str(variant): int(count) for variant, count in counts.items() if count}
+
+
+def show_process_map(variant_text, cache=process_map_cache):
+    """Displays the process map of a variant, from the cache when possible."""
+    source, svg = cache.get(variant_text)
+    if svg is not None:
+        st.image(svg)
+    else:
+        st.graphviz_chart(source)
@@ -0,0 +1,167 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from frame_memo import derived, share_frame
+
+
+class MiningResult:
+    """
+    Variants, case durations and directly-follows frequencies mined from an event log.
+
+    Attributes
+    ----------
+    cases : DataFrame
+        Indexed by case, with 'Variant', 'start', 'end', 'Duration (Seconds)' and 'events'.
+    variants : DataFrame
+        Indexed by 'Variant', with 'Variant Rank' (1 is the most frequent), 'cases' and
+        'mean_duration' in seconds, sorted by rank.
+    dfg : DataFrame
+        Directly-follows pairs with 'source', 'target' and 'count', most frequent first.
+    """
+
+    def __init__(self, cases, variants, dfg):
+        self.cases = cases
+        self.variants = variants
+        self.dfg = dfg
+
+
+def _ordered_events(events, case_column, activity_column, timestamp_column):
+    """Returns the case codes, activities and timestamps sorted by case, then time."""
+    case_codes, case_values = pd.factorize(events[case_column])
+    activities = events[activity_column].astype(str).to_numpy()
+    if timestamp_column and timestamp_column in events.columns:
+        timestamps = pd.to_datetime(events[timestamp_column]).to_numpy()
+        order = np.lexsort((timestamps, case_codes))
+        timestamps = timestamps[order]
+    else:
+        # no timestamps: the rows are taken to be in event order within each case
+        order = np.argsort(case_codes, kind='stable')
+        timestamps = None
+    return case_codes[order], case_values, activities[order], timestamps
+
+
+def _mine_cases(events, case_column, activity_column, timestamp_column):
+    """Mines the cases and directly-follows counts of one partition of the log."""
+    case_codes, case_values, activities, timestamps = _ordered_events(events, case_column, activity_column,
+                                                                      timestamp_column)
+    if len(case_codes) == 0:
+        cases = pd.DataFrame(columns=['Variant', 'start', 'end', 'Duration (Seconds)', 'events'])
+        return cases, pd.DataFrame(columns=['source', 'target', 'count'])
+    starts = np.flatnonzero(np.r_[True, case_codes[1:] != case_codes[:-1]])
+    ends = np.r_[starts[1:], len(case_codes)] - 1
+
+    variants = pd.Series(activities).groupby(np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(case_codes)])),
+                                              sort=True).agg(','.join)
+    cases = pd.DataFrame({'Variant': variants.to_numpy(), 'events': ends - starts + 1},
+                         index=pd.Index(case_values.take(case_codes[starts]), name=case_column))
+    if timestamps is not None:
+        cases['start'] = timestamps[starts]
+        cases['end'] = timestamps[ends]
+        cases['Duration (Seconds)'] = (cases['end'] - cases['start']).dt.total_seconds()
+    else:
+        cases['start'] = pd.NaT
+        cases['end'] = pd.NaT
+        cases['Duration (Seconds)'] = np.nan
+
+    same_case = case_codes[1:] == case_codes[:-1]
+    pairs = pd.DataFrame({'source': activities[:-1][same_case], 'target': activities[1:][same_case]})
+    dfg = pairs.groupby(['source', 'target']).size().rename('count').reset_index()
+    return cases, dfg
+
+
+def _rank_variants(cases):
+    variants = cases.groupby('Variant').agg(cases=('events', 'size'), mean_duration=('Duration (Seconds)', 'mean'))
+    variants = variants.reset_index().sort_values(['cases', 'Variant'], ascending=[False, True])
+    variants['Variant Rank'] = np.arange(1, len(variants) + 1)
+    return variants.set_index('Variant')[['Variant Rank', 'cases', 'mean_duration']]
+
+
+def mine_event_log(events, case_column='Case ID', activity_column='concept:name', timestamp_column='time:timestamp',
+                   workers=1):
+    """
+    Derives variants, ranks, case durations and directly-follows frequencies from raw events.
+
+    Events are sorted once by case and timestamp; case boundaries, durations and
+    directly-follows pairs then come from vectorized operations on the sorted arrays.
+
+    Parameters
+    ----------
+        events : DataFrame
+            One row per event.
+        case_column, activity_column, timestamp_column : str, optional
+            The case identifier, activity name and event timestamp columns. Without the
+            timestamp column, rows are taken to be in event order and durations are NaN.
+        workers : int, optional
+            With more than one worker, cases are split by a hash of their identifier and the
+            partitions are mined in separate processes.
+
+    Returns
+    -------
+        MiningResult
+            The mined cases, ranked variants and directly-follows graph.
+    """
+    columns = [c for c in (case_column, activity_column, timestamp_column) if c and c in events.columns]
+    events = events[columns]
+    if workers > 1 and len(events):
+        shard = pd.util.hash_pandas_object(events[case_column], index=False).to_numpy() % workers
+        partitions = [events[shard == i] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            mined = list(executor.map(_mine_cases, partitions, [case_column] * workers, [activity_column] * workers,
+                                      [timestamp_column] * workers))
+        cases = pd.concat([c for c, _ in mined])
+        dfg = pd.concat([d for _, d in mined]).groupby(['source', 'target'])['count'].sum().reset_index()
+    else:
+        cases, dfg = _mine_cases(events, case_column, activity_column, timestamp_column)
+    dfg = dfg.sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
+    return MiningResult(cases, _rank_variants(cases), dfg)
+
+
+def event_durations(events, case_column='Case ID', timestamp_column='time:timestamp'):
+    """
+    Returns the seconds between every event and the previous event of its case, aligned
+    with events; the first event of a case has no predecessor and gets NaN.
+
+    Events are taken to be timestamped when they complete, so the gap is the time the step
+    took.
+    """
+    case_codes, _ = pd.factorize(events[case_column])
+    timestamps = pd.to_datetime(events[timestamp_column]).to_numpy()
+    order = np.lexsort((timestamps, case_codes))
+    ordered = timestamps[order]
+    same_case = case_codes[order][1:] == case_codes[order][:-1]
+    gaps = np.full(len(order), np.nan)
+    gaps[1:][same_case] = ((ordered[1:] - ordered[:-1]) / np.timedelta64(1, 's'))[same_case]
+    durations = np.empty(len(order))
+    durations[order] = gaps
+    return pd.Series(durations, index=events.index, name='Duration (Seconds)')
+
+
+def annotate_events(events, case_column='Case ID', timestamp_column='time:timestamp', **kwargs):
+    """
+    Returns events with 'Variant' and 'Variant Rank' columns mined from the log itself,
+    sorted by rank.
+
+    Raw logs without a 'Duration (Seconds)' column also get one from event_durations, so
+    the KPIs and step histograms have a per-event duration to work with.
+
+    The result is derived once per dataframe, so shared frames are mined once per table
+    version, and every caller gets a copy of its own (see share_frame).
+    """
+    return share_frame(derived(events, ('annotated', case_column, timestamp_column, tuple(sorted(kwargs.items()))),
+                               lambda d: _annotate(d, case_column, timestamp_column, **kwargs)))
+
+
+def _annotate(events, case_column, timestamp_column, **kwargs):
+    """Mines events and returns them with the columns described in annotate_events."""
+    result = mine_event_log(events, case_column=case_column, timestamp_column=timestamp_column, **kwargs)
+    variant_of_case = result.cases['Variant']
+    variant = events[case_column].map(variant_of_case)
+    columns = {
+        'Variant': variant,
+        'Variant Rank': variant.map(result.variants['Variant Rank']),
+    }
+    if 'Duration (Seconds)' not in events.columns and timestamp_column in events.columns:
+        columns['Duration (Seconds)'] = event_durations(events, case_column, timestamp_column)
+    return events.assign(**columns).sort_values('Variant Rank', kind='stable')
@@ -0,0 +1,145 @@
+import os
+import sys
+
+import streamlit as st
+
+
+# Heavy modules (pandas, the Supabase client, the data layer) are imported inside the
+# functions below, so a page that needs no data does not pay for them.
+
+# Set REWINDING_LOCAL_DATA to a directory of table files to run offline
+LOCAL_DATA = os.environ.get("REWINDING_LOCAL_DATA")
+
+# Fetched tables are kept here as Arrow files so restarts do not wait on Supabase
+CACHE_DIR = os.environ.get("REWINDING_CACHE_DIR", ".cache/tables")
+
+# Push filter selections down to Supabase instead of loading whole tables
+PUSHDOWN = os.environ.get("REWINDING_PUSHDOWN", "0") == "1"
+
+# Machine event logs are append-only: refresh them by fetching rows past this column's high-water mark.
+# Events that arrive late with a timestamp at or below it are missed until the table is fully reloaded
+# with TableStore.invalidate, which also drops the disk copy.
+EVENT_LOG_WATERMARK = "time:timestamp"
+
+# Columns that identify a row; whole-table loads are paged in this order
+ALL_VARIANTS_KEY = ("machine", "Case ID")
+EVENT_LOG_KEY = (EVENT_LOG_WATERMARK, "Case ID", "concept:name")
+
+# Tables are kept in this order in memory and on disk, the order the pages show them in
+TABLE_ORDER = "Variant Rank"
+
+# Machines listed until all_variants is loaded, or when it lists none
+DEFAULT_MACHINES = ("M001", "M002", "M003")
+
+# Most machines the Steps page compares at once; each compared machine loads its whole event table
+MAX_COMPARE_MACHINES = 4
+
+# Number of machine tables loaded in the background ahead of the user
+PREFETCH_MACHINES = 8
+
+# Filter selections are staged and applied together, so one click costs at most one rerun
+FILTER_APPLY_MODE = "batch"
+
+# Rows per page of the Detailed Data View
+DETAIL_PAGE_SIZE = 200
+
+# Filter columns the KPI cubes of the Variants and Steps pages pre-aggregate over. A cube holds
+# one cell per combination of their values, so it is only kept to low-cardinality columns;
+# selections on the other filters (week_number) are answered by scanning the filtered rows.
+VARIANTS_KPI_DIMENSIONS = ['machine', 'Variant Rank']
+STEPS_KPI_DIMENSIONS = ['Variant Rank', 'concept:name']
+
+
+def get_connection():
+    """
+    Returns the app's data connection.
+
+    st.connection caches the connection as a resource, so every session and rerun shares
+    one client and its pooled HTTP connections; it is only opened by the first page that
+    needs data.
+    """
+    if LOCAL_DATA:
+        from local_connection import LocalSupabaseConnection
+        return st.connection("local", type=LocalSupabaseConnection, directory=LOCAL_DATA)
+    from st_supabase_connection import SupabaseConnection
+    return st.connection("supabase", type=SupabaseConnection)
+
+
+def get_store():
+    """Returns the process-wide TableStore of the connection."""
+    from data_access import get_table_store
+    return get_table_store(get_connection(), cache_dir=CACHE_DIR, keys=(("all_variants", ALL_VARIANTS_KEY),),
+                           order_by=TABLE_ORDER)
+
+
+def fetch_data(table_name, sort_by=None):
+    # Tables are cached process-wide and every caller gets a shallow copy of its own;
+    # concurrent requests for the same table wait on a single fetch
+    return get_store().get(table_name, sort_by=sort_by)
+
+
+def get_registry():
+    """
+    Returns the machine registry, with the store set to refresh machine tables incrementally.
+
+    Discovery never waits for all_variants to load: until it is in memory or on disk,
+    DEFAULT_MACHINES are listed, and schedule_prefetch loads it once the page has rendered.
+    In pushdown mode the machines come from a distinct query on all_variants, so the table
+    is never loaded into memory.
+    """
+    from machine_registry import MachineRegistry
+    store = get_store()
+    if PUSHDOWN:
+        from supabase_pushdown import PushdownSource
+        registry = MachineRegistry.discover_distinct(PushdownSource(get_connection(), "all_variants"),
+                                                     fallback=DEFAULT_MACHINES)
+    else:
+        registry = MachineRegistry.discover(store, fallback=DEFAULT_MACHINES)
+    tables = registry.table_map().values()
+    store.set_watermarks({table: EVENT_LOG_WATERMARK for table in tables})
+    store.set_keys({table: EVENT_LOG_KEY for table in tables})
+    return registry
+
+
+def get_fleet():
+    """
+    Returns the fleet-wide view partitioned by machine and week; machine tables are
+    loaded only when a query needs them.
+    """
+    from machine_registry import PartitionedEventLog
+    return PartitionedEventLog(get_registry(), get_store())
+
+
+def schedule_prefetch():
+    """
+    Loads all_variants and the first machines' tables in the background, so switching
+    machines or pages rarely waits on the network.
+
+    Called after a data page has rendered, so discovering the machines does not delay it.
+    Nothing is prefetched in pushdown mode, where tables are only loaded when a page needs
+    them.
+    """
+    if PUSHDOWN:
+        return
+    from prefetch import get_prefetcher
+    table_map = get_registry().table_map()
+    get_prefetcher(get_store()).schedule(["all_variants", *list(table_map.values())[:PREFETCH_MACHINES]])
+
+
+def loaded_memory_reports():
+    """Returns the compaction reports of the tables in memory, for the debug panel."""
+    if 'data_access' not in sys.modules:
+        return {}
+    return get_store().memory_reports()
+
+
+def loaded_caches():
+    """Returns the caches of the data modules loaded so far, for the debug panel."""
+    caches = {}
+    if 'data_access' in sys.modules:
+        caches['tables'] = get_store()
+    if 'custom_dynamic_filters' in sys.modules:
+        caches['filter_results'] = sys.modules['custom_dynamic_filters'].result_cache
+    if 'process_maps' in sys.modules:
+        caches['process_maps'] = sys.modules['process_maps'].process_map_cache
+    return caches
@@ -0,0 +1,211 @@
+import re
+
+import streamlit as st
+import pandas as pd
+
+from custom_dynamic_filters import normalize_selection
+from instrumentation import profiler
+
+
+# Supabase caps every response at this many rows, so larger results are fetched in pages.
+PAGE_SIZE = 1000
+
+_PLAIN_COLUMN = re.compile(r"^\w+$")
+
+
+def quote_column(name):
+    """Quotes a column name for a PostgREST select list when it contains reserved characters."""
+    if _PLAIN_COLUMN.match(name):
+        return name
+    return '"%s"' % name.replace('"', '\\"')
+
+
+def aggregate_expression(alias, function, column=None):
+    """
+    Returns a PostgREST aggregate select item, e.g. 'mean:"Duration (Seconds)".avg()'.
+
+    Without a column the item counts rows. Plain columns selected next to aggregates
+    group the result by those columns.
+    """
+    if column is None:
+        return f"{alias}:{function}()"
+    return f"{alias}:{quote_column(column)}.{function}()"
+
+
+def selection_predicates(selections, except_filter=None):
+    """
+    Translates a DynamicFilters selection into query predicates.
+
+    Parameters
+    ----------
+        selections : dict
+            Filter names mapped to their selected values.
+        except_filter : str, optional
+            The filter name to leave out.
+
+    Returns
+    -------
+        tuple
+            Hashable (column, operator, value) triples; a single value becomes an 'eq'
+            predicate and several values an 'in' predicate.
+    """
+    predicates = []
+    for column, values in normalize_selection(selections, except_filter):
+        if len(values) == 1:
+            predicates.append((column, 'eq', values[0]))
+        else:
+            predicates.append((column, 'in', values))
+    return tuple(predicates)
+
+
+def execute_query(conn, table, columns=None, predicates=(), order_by=None, page_size=PAGE_SIZE, aggregates=()):
+    """
+    Runs a projected, filtered select against Supabase and returns all matching rows.
+
+    A fresh request builder is created for every page: the builders returned by
+    conn.query are cached and shared, and filters chained on them would accumulate.
+
+    Parameters
+    ----------
+        conn : SupabaseConnection
+            The Streamlit Supabase connection.
+        table : str
+            The table to query.
+        columns : list, optional
+            Columns to return. Defaults to all columns.
+        predicates : tuple, optional
+            (column, operator, value) triples from selection_predicates.
+        order_by : str or tuple, optional
+            Column, or columns in priority order, to sort the result by, ascending. Paged
+            results are only consistent when these identify a row.
+        page_size : int, optional
+            Number of rows requested per round trip.
+        aggregates : tuple, optional
+            (alias, function, column) triples computed by the database, grouped by
+            columns. PostgREST only accepts them with db-aggregates-enabled set.
+
+    Returns
+    -------
+        list
+            The rows as a list of dictionaries.
+    """
+    items = [quote_column(c) for c in columns or ()]
+    items.extend(aggregate_expression(*aggregate) for aggregate in aggregates)
+    select = ",".join(items) or "*"
+    rows = []
+    start = 0
+    while True:
+        builder = conn.client.table(table).select(select)
+        for column, operator, value in predicates:
+            if operator == 'eq':
+                builder = builder.eq(column, value)
+            elif operator == 'in':
+                builder = builder.in_(column, value)
+            else:
+                builder = builder.filter(column, operator, value)
+        for column in (order_by,) if isinstance(order_by, str) else order_by or ():
+            builder = builder.order(quote_column(column))
+        with profiler.stage('supabase_fetch'):
+            response = builder.range(start, start + page_size - 1).execute()
+        page = response.data if isinstance(getattr(response, 'data', None), list) else []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def table_columns(conn, table):
+    """Returns the column names of table, read from its first row; empty for an empty table."""
+    with profiler.stage('supabase_fetch'):
+        response = conn.client.table(table).select("*").limit(1).execute()
+    rows = response.data if isinstance(getattr(response, 'data', None), list) else []
+    return list(rows[0]) if rows else []
+
+
+@st.cache_data(ttl="10m", show_spinner=False)
+def _cached_rows(_conn, table, columns, predicates, order_by, aggregates=()):
+    """Caches execute_query results by table, projection, predicates and aggregates."""
+    return execute_query(_conn, table, columns=list(columns) if columns else None,
+                         predicates=predicates, order_by=order_by, aggregates=aggregates)
+
+
+class PushdownSource:
+    """
+    Serves DynamicFilters from Supabase instead of a dataframe held in memory.
+
+    Selections are pushed down as 'eq'/'in' predicates together with the column
+    projection, so only the rows and columns that are displayed are transferred. Option
+    lists and totals are aggregated by the database (one row per distinct value, one row
+    of totals), so their size does not depend on the size of the table. This needs
+    PostgREST's aggregate functions to be enabled.
+
+    Attributes
+    ----------
+    conn : SupabaseConnection
+        The Streamlit Supabase connection.
+    table : str
+        The table the filters apply to.
+    columns : list or None
+        The column projection for filtered results; None fetches every column.
+    order_by : str, tuple or None
+        Column, or columns in priority order, the filtered results are sorted by. Results
+        are fetched in pages, so the columns must identify a row for the pages to be
+        consistent.
+    """
+
+    def __init__(self, conn, table, columns=None, order_by=None):
+        self.conn = conn
+        self.table = table
+        self.columns = list(columns) if columns else None
+        self.order_by = order_by
+
+    def fetch(self, selections, except_filter=None, columns=None):
+        """
+        Returns the rows matching selections as a dataframe.
+
+        Parameters
+        ----------
+            selections : dict
+                Filter names mapped to their selected values.
+            except_filter : str, optional
+                The filter name that should be excluded from the pushed-down predicates.
+            columns : list, optional
+                Overrides the source's column projection for this call.
+
+        Returns
+        -------
+            DataFrame
+                The matching rows.
+        """
+        columns = columns or self.columns
+        rows = _cached_rows(self.conn, self.table, tuple(columns) if columns else None,
+                            selection_predicates(selections, except_filter), self.order_by)
+        return pd.DataFrame(rows, columns=columns)
+
+    def distinct(self, column, selections):
+        """
+        Returns the sorted distinct values of column under the other filters' selections.
+
+        The column is grouped with a row count, so one row per distinct value is returned.
+        """
+        rows = _cached_rows(self.conn, self.table, (column,),
+                            selection_predicates(selections, except_filter=column), column,
+                            aggregates=(('rows', 'count', None),))
+        values = pd.Series([row.get(column) for row in rows], dtype=object)
+        return values.dropna().drop_duplicates().sort_values().tolist()
+
+    def totals(self, selections, duration_column='Duration (Seconds)', count_column='Case ID'):
+        """
+        Returns the cycle count and mean duration of the rows matching selections.
+
+        Returns
+        -------
+            dict
+                'cycles', the number of non-null count_column values, and 'mean', the mean
+                of duration_column (NaN when no row matches).
+        """
+        rows = _cached_rows(self.conn, self.table, None, selection_predicates(selections), None,
+                            aggregates=(('cycles', 'count', count_column), ('mean', 'avg', duration_column)))
+        row = rows[0] if rows else {}
+        mean = row.get('mean')
+        return {'cycles': int(row.get('cycles') or 0), 'mean': float(mean) if mean is not None else float('nan')}
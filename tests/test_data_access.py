@@ -0,0 +1,130 @@
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from data_access import TableStore, load_rows_after, load_table
+from disk_cache import DiskTableCache
+from local_connection import LocalClient
+
+
+TABLE = 'M001_Data'
+WATERMARK = 'time:timestamp'
+KEY = (WATERMARK, 'Case ID', 'concept:name')
+
+
+def events(cases, start):
+    """Returns an event log of cases cycles with two steps each, starting at case number start."""
+    case_ids = [c for c in range(start, start + cases) for _ in range(2)]
+    return pd.DataFrame({
+        'Case ID': case_ids,
+        'concept:name': ['Load Reel', 'Rewind'] * cases,
+        'time:timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(
+            [c * 60 + i for c in range(start, start + cases) for i in (0, 30)], unit='s'),
+    })
+
+
+def make_store(data_dir, cache_dir, conn=None):
+    """Returns a TableStore over the tables in data_dir, as a new process would build it."""
+    conn = conn or SimpleNamespace(client=LocalClient(str(data_dir)))
+    return TableStore(lambda table, key: load_table(conn, table, key),
+                      delta_loader=lambda table, column, watermark, key: load_rows_after(conn, table, column,
+                                                                                         watermark, key),
+                      watermarks={TABLE: WATERMARK}, keys={TABLE: KEY}, disk_cache=DiskTableCache(str(cache_dir)))
+
+
+def wait_for_revalidation(store, table, timeout=10):
+    deadline = time.monotonic() + timeout
+    while table in store._revalidating:
+        assert time.monotonic() < deadline, "revalidation did not finish"
+        time.sleep(0.01)
+
+
+def test_watermark_keeps_its_type_on_disk(tmp_path):
+    cache = DiskTableCache(str(tmp_path))
+    watermark = pd.Timestamp('2024-01-01 10:00:00.123456789', tz='UTC')
+    cache.write(TABLE, events(1, 0), 1, watermark)
+
+    stored = cache.metadata(TABLE)['watermark']
+
+    assert isinstance(stored, pd.Timestamp)
+    assert stored == watermark
+
+
+def test_cold_start_from_disk_then_delta_refresh(tmp_path):
+    data_dir, cache_dir = tmp_path / 'data', tmp_path / 'cache'
+    data_dir.mkdir()
+    events(50, 0).to_parquet(data_dir / f'{TABLE}.parquet')
+
+    first = make_store(data_dir, cache_dir)
+    snapshot = first.snapshot(TABLE)
+    first.disk_cache.write(TABLE, snapshot.df, snapshot.version, snapshot.watermark)
+
+    appended = pd.concat([events(50, 0), events(5, 50)], ignore_index=True)
+    appended.to_parquet(data_dir / f'{TABLE}.parquet')
+
+    second = make_store(data_dir, cache_dir)
+    stale = second.snapshot(TABLE)
+    assert isinstance(stale.watermark, pd.Timestamp)
+    wait_for_revalidation(second, TABLE)
+    refreshed = second.snapshot(TABLE)
+
+    assert second.fetches == 0
+    assert second.delta_fetches == 1
+    assert len(refreshed.df) == len(appended)
+    assert set(refreshed.df['Case ID']) == set(appended['Case ID'])
+    assert refreshed.watermark == appended[WATERMARK].max()
+    assert isinstance(refreshed.watermark, pd.Timestamp)
+
+
+def test_every_caller_gets_its_own_copy():
+    store = TableStore(lambda table, key: events(3, 0))
+
+    first = store.get(TABLE, sort_by='Case ID')
+    second = store.get(TABLE, sort_by='Case ID')
+    first['extra'] = 1
+    first.loc[first.index[0], 'Case ID'] = 99
+    first.loc[first.index[1], 'concept:name'] = 'Load Reel'
+
+    assert first is not second
+    assert 'extra' not in second.columns
+    assert second['Case ID'].iloc[0] == 0
+    assert second['concept:name'].iloc[1] == 'Rewind'
+    assert store.get(TABLE, sort_by='Case ID')['Case ID'].iloc[0] == 0
+    assert store.fetches == 1
+
+
+def test_invalidate_reloads_late_rows_despite_the_disk_copy(tmp_path):
+    data_dir, cache_dir = tmp_path / 'data', tmp_path / 'cache'
+    data_dir.mkdir()
+    events(5, 0).to_parquet(data_dir / f'{TABLE}.parquet')
+    conn = SimpleNamespace(client=LocalClient(str(data_dir)))
+    store = make_store(data_dir, cache_dir, conn)
+    snapshot = store.snapshot(TABLE)
+    store.disk_cache.write(TABLE, snapshot.df, snapshot.version, snapshot.watermark)
+
+    # a late event, timestamped before the watermark, that a delta refresh never fetches
+    late = events(1, 0).assign(**{'Case ID': 99})
+    pd.concat([events(5, 0), late], ignore_index=True).to_parquet(data_dir / f'{TABLE}.parquet')
+    conn.client = LocalClient(str(data_dir))
+    store.invalidate()
+
+    assert store.disk_cache.tables() == []
+    assert 99 in set(store.snapshot(TABLE).df['Case ID'])
+    assert store.fetches == 2
+    assert store.delta_fetches == 0
+
+
+def test_delta_refresh_merges_appended_rows_into_the_order():
+    table = pd.DataFrame({'Case ID': range(6), 'Variant Rank': [3, 1, 2, 1, 3, 2]})
+    loaded = {'rows': 4}
+    store = TableStore(lambda name, key: table.iloc[:loaded['rows']], ttl=0,
+                       delta_loader=lambda name, column, watermark, key: table[table['Case ID'] > watermark],
+                       watermarks={TABLE: 'Case ID'}, order_by='Variant Rank')
+    store.get(TABLE)
+    loaded['rows'] = 6
+
+    refreshed = store.get(TABLE, sort_by='Variant Rank')
+
+    assert store.delta_fetches == 1
+    assert list(refreshed['Case ID']) == [1, 3, 2, 5, 0, 4]